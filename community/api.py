@@ -1,8 +1,8 @@
 from ninja import Router
-from ninja_jwt.authentication import JWTAuth
+from users.auth import CachedJWTAuth
 from .models import Community
 
-router = Router(auth=JWTAuth())
+router = Router(auth=CachedJWTAuth())
 
 @router.get("/")
 def list_communities(request):
@@ -1,12 +1,14 @@
 from ninja import Router
+from users.auth import CachedJWTAuth
 from .models import Notification
+from .outbox import outbox_metrics
 
-router = Router(auth=JWTAuth())
+router = Router(auth=CachedJWTAuth())
 
 @router.get("/")
 def list_notifications(request):
     notifications = Notification.objects.filter(recipient=request.auth, is_read=False)
-    return notifications.values()
+    return list(notifications.values())
 
 @router.post("/{notification_id}/read/")
 def mark_as_read(request, notification_id: int):
@@ -14,3 +16,11 @@ def mark_as_read(request, notification_id: int):
     notification.is_read = True
     notification.save()
     return {"message": "Notification marked as read"}
+
+# Delivery backlog of the notification outbox
+@router.get("/outbox/stats/")
+def outbox_stats(request):
+    """Undelivered events and how long the oldest has been waiting. Staff only."""
+    if not request.auth.is_staff:
+        return {"error": "Only staff can view outbox statistics"}
+    return outbox_metrics()
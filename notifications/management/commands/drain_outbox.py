@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import DRAIN_BATCH_SIZE, drain_outbox, outbox_metrics
+
+
+class Command(BaseCommand):
+    help = "Turn pending outbox events into notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DRAIN_BATCH_SIZE)
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep running and drain every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            result = drain_outbox(batch_size=options["batch_size"])
+            if result.events or not options["interval"]:
+                metrics = outbox_metrics()
+                self.stdout.write(
+                    f"Delivered {result.events} events as {result.notifications} notifications in {result.batches} "
+                    f"batches ({(time.perf_counter() - started) * 1000:.1f} ms), max lag {result.max_lag:.2f}s, "
+                    f"{metrics['pending']} pending"
+                )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -6,3 +6,25 @@ class Notification(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # The outbox event this notification was delivered from, if any.
+    event_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recipient", "is_read"], name="notification_unread_idx"),
+        ]
+        constraints = [
+            # Delivery is at-least-once; redelivering an event must not notify twice.
+            models.UniqueConstraint(fields=["event_id", "recipient"], name="unique_notification_per_event"),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """
+    An event recorded in the same transaction as the change it describes and
+    turned into notifications later by notifications.outbox.drain_outbox.
+    Rows are deleted once delivered, so the table only holds the backlog.
+    """
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from orders.models import Order
+from .models import Notification, OutboxEvent
+
+
+DRAIN_BATCH_SIZE = 500
+
+ORDER_MESSAGES = {
+    "order.created": (
+        "Your order #{id} for {quantity} x {product} ({total_price}) was placed.",
+        "New order #{id}: {quantity} x {product} ({total_price}).",
+    ),
+    "order.cancelled": (
+        "Your order #{id} for {quantity} x {product} was cancelled.",
+        "Order #{id} for {quantity} x {product} was cancelled by the buyer.",
+    ),
+    "order.completed": (
+        "Your order #{id} for {quantity} x {product} is complete.",
+        "Order #{id} for {quantity} x {product} was completed.",
+    ),
+}
+
+
+def publish_order_events(orders, event_type):
+    """
+    Record ``event_type`` for each of ``orders`` in the outbox. Call inside the
+    transaction that changes the orders so the events commit or roll back
+    with them; the payload is only the order id, so this is one INSERT.
+    """
+    if event_type not in ORDER_MESSAGES:
+        raise ValueError(f"Unknown order event '{event_type}'")
+    OutboxEvent.objects.bulk_create(
+        [OutboxEvent(event_type=event_type, payload={"order_id": order.id}) for order in orders]
+    )
+
+
+@dataclass
+class DrainResult:
+    events: int = 0
+    notifications: int = 0
+    batches: int = 0
+    max_lag: float = 0.0
+
+
+def _notifications(events):
+    order_ids = {event.payload["order_id"] for event in events}
+    orders = {
+        row["id"]: row
+        for row in Order.objects.filter(id__in=order_ids).values(
+            "id", "buyer_id", "quantity", "total_price",
+            seller_id=F("offer__product__seller_id"), product=F("offer__product__name"),
+        )
+    }
+    notifications = []
+    for event in events:
+        order = orders.get(event.payload["order_id"])
+        if order is None:
+            continue  # deleted since; nothing left to tell anyone about
+        buyer_message, seller_message = ORDER_MESSAGES[event.event_type]
+        notifications.append(Notification(recipient_id=order["buyer_id"], message=buyer_message.format(**order),
+                                          event_id=event.id))
+        if order["seller_id"] != order["buyer_id"]:
+            notifications.append(Notification(recipient_id=order["seller_id"], message=seller_message.format(**order),
+                                              event_id=event.id))
+    return notifications
+
+
+def drain_batch(batch_size=DRAIN_BATCH_SIZE):
+    """
+    Deliver up to ``batch_size`` of the oldest events. Returns ``(events, notifications, lag)``.
+    Notifications are written and events deleted in one transaction; if a
+    worker dies halfway the batch is delivered again, and the unique
+    (event_id, recipient) constraint drops the duplicates.
+    """
+    with transaction.atomic():
+        events = OutboxEvent.objects.order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several workers drain side by side without taking the same batch.
+            events = events.select_for_update(skip_locked=True)
+        events = list(events[:batch_size])
+        if not events:
+            return 0, 0, 0.0
+        notifications = Notification.objects.bulk_create(_notifications(events), ignore_conflicts=True)
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).delete()
+    lag = (timezone.now() - events[0].created_at).total_seconds()
+    return len(events), len(notifications), lag
+
+
+def drain_outbox(batch_size=DRAIN_BATCH_SIZE):
+    """Deliver every pending event, a batch at a time."""
+    result = DrainResult()
+    while True:
+        events, notifications, lag = drain_batch(batch_size)
+        if not events:
+            return result
+        result.events += events
+        result.notifications += notifications
+        result.batches += 1
+        result.max_lag = max(result.max_lag, lag)
+
+
+def outbox_metrics():
+    """Backlog size and the age of the oldest undelivered event, read from the database."""
+    backlog = OutboxEvent.objects.aggregate(pending=Count("id"), oldest=Min("created_at"))
+    oldest = backlog["oldest"]
+    return {
+        "pending": backlog["pending"],
+        "oldest_pending_seconds": (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
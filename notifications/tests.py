@@ -1,3 +1,68 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from ninja_jwt.tokens import RefreshToken
+
+from orders.placement import cancel_pending_order, place_order
+from products.models import Category, Offer, Product
+from users.models import User
+from .models import Notification, OutboxEvent
+from .outbox import drain_batch, drain_outbox
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.buyer = User.objects.create_user(username="buyer", password="secret", role="buyer")
+        category = Category.objects.create(name="Crop")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100, seller=cls.seller,
+        )
+        cls.offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=5, quantity=10, min_order=1, max_order=10,
+            created_by=cls.seller, expires_at=timezone.now() + timedelta(days=7),
+        )
+
+    def test_order_changes_are_recorded_and_delivered_to_both_sides(self):
+        order, _ = place_order(self.buyer, self.offer.id, 2)
+        cancel_pending_order(order.id, self.buyer)
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+        self.assertFalse(Notification.objects.exists())
+
+        result = drain_outbox()
+        self.assertEqual((result.events, result.notifications), (2, 4))
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(
+            list(Notification.objects.filter(recipient=self.seller).order_by("id").values_list("message", flat=True)),
+            [f"New order #{order.id}: 2 x Maize (10.00).",
+             f"Order #{order.id} for 2 x Maize was cancelled by the buyer."],
+        )
+
+        token = RefreshToken.for_user(self.buyer).access_token
+        response = self.client.get("/api/notifications/", headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(len(response.json()), 2)
+
+    def test_redelivery_does_not_duplicate_notifications(self):
+        place_order(self.buyer, self.offer.id, 1)
+        event = OutboxEvent.objects.get()
+        drain_batch()
+        # A worker that died before deleting its batch delivers it again.
+        OutboxEvent.objects.create(id=event.id, event_type=event.event_type, payload=event.payload)
+        self.assertEqual(drain_batch()[0], 1)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def outbox_stats(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get("/api/notifications/outbox/stats/", headers={"Authorization": f"Bearer {token}"})
+
+    def test_stats_report_the_backlog_to_staff_only(self):
+        place_order(self.buyer, self.offer.id, 1)
+        self.assertEqual(self.client.get("/api/notifications/outbox/stats/").status_code, 401)
+        self.assertEqual(self.outbox_stats(self.buyer).json(), {"error": "Only staff can view outbox statistics"})
 
-# Create your tests here.
+        staff = User.objects.create_user(username="staff", password="secret", role="farmer", is_staff=True)
+        stats = self.outbox_stats(staff).json()
+        self.assertEqual(stats["pending"], 1)
+        self.assertGreaterEqual(stats["oldest_pending_seconds"], 0)
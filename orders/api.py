@@ -1,12 +1,22 @@
-from ninja import Router
-from ninja_jwt.authentication import JWTAuth
+from ninja import Query, Router
+from users.auth import CachedJWTAuth
 from django.db import transaction
-from datetime import datetime
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from datetime import date
+from .export import WRITERS, export_orders
+from .idempotency import idempotent
 from .models import Order
-from products.models import Offer
-from pydantic import BaseModel
+from .placement import CHECKOUT_MODES, PlacementError, cancel_pending_order, checkout, place_order
+from .sales import record_completed
+from notifications.outbox import publish_order_events
+from products.pagination import ORDER_ORDERINGS, InvalidCursor, paginate
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
-router = Router(auth=JWTAuth())
+router = Router(auth=CachedJWTAuth())
+
+ORDER_PAGE_SIZE = 20
 
 # Schema for creating an order
 class OrderSchema(BaseModel):
@@ -15,77 +25,89 @@ class OrderSchema(BaseModel):
 
 # Create an order for an offer
 @router.post("/create/")
+@idempotent
 def create_order(request, data: OrderSchema):
     try:
-        offer = Offer.objects.get(id=data.offer_id, is_active=True)
-
-        # Check if sufficient quantity is available in the offer
-        if offer.quantity < data.quantity:
-            return {"error": "Not enough quantity available in the offer"}
-
-        total_price = data.quantity * offer.price_per_unit
+        order, product_name = place_order(request.auth, data.offer_id, data.quantity)
+    except PlacementError as error:
+        return {"error": str(error)}
+    return {
+        "order_id": order.id,
+        "status": order.status,
+        "total_price": order.total_price,
+        "offer": product_name,
+    }
 
-        with transaction.atomic():
-            # Create the order
-            order = Order.objects.create(
-                buyer=request.auth,
-                offer=offer,
-                quantity=data.quantity,
-                total_price=total_price,
-                status="Pending",
-            )
+# Schema for checking out several offers at once
+class CheckoutSchema(BaseModel):
+    lines: List[OrderSchema] = Field(..., min_length=1, max_length=100)
+    mode: Literal[CHECKOUT_MODES] = "all_or_nothing"
 
-            # Deduct quantity from the offer
-            offer.quantity -= data.quantity
-            if offer.quantity == 0:
-                offer.is_active = False
-            offer.save()
-
-        return {
-            "order_id": order.id,
-            "status": order.status,
-            "total_price": total_price,
-            "offer": offer.product.name,
-        }
-    except Offer.DoesNotExist:
-        return {"error": "Offer not found or no longer active"}
+# Order from several offers in one transaction
+@router.post("/checkout/")
+@idempotent
+def checkout_cart(request, data: CheckoutSchema):
+    try:
+        lines = checkout(request.auth, [(line.offer_id, line.quantity) for line in data.lines], data.mode)
+    except PlacementError as error:
+        return {"error": str(error)}
+    placed = [line for line in lines if line["status"] == "placed"]
+    return {
+        "mode": data.mode,
+        "placed": len(placed),
+        "total_price": sum(line["total_price"] for line in placed),
+        "lines": lines,
+    }
 
-# List all orders for the authenticated user
+# List the authenticated user's orders, newest first. Pass limit or cursor to
+# page through them; without either every order is returned, as before paging.
 @router.get("/list/")
-def list_orders(request):
-    user = request.auth
-    orders = Order.objects.filter(buyer=user).values(
-        "id",
-        "offer__product__name",
-        "quantity",
-        "total_price",
-        "status",
-        "created_at",
-    )
-    return {"orders": list(orders)}
+def list_orders(
+    request,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+):
+    """
+    Paged responses carry ``next_cursor``; request it with ``cursor`` to get
+    the next page, until it is null. Pages default to ORDER_PAGE_SIZE orders.
+    """
+    orders = Order.objects.filter(buyer=request.auth)
+    fields = ("id", "offer__product__name", "quantity", "total_price", "status", "created_at")
+    if limit is None and cursor is None:
+        return {"orders": list(orders.order_by(*ORDER_ORDERINGS["newest"]).values(*fields))}
+    try:
+        rows, next_cursor, total_count = paginate(
+            orders, ORDER_ORDERINGS, "newest", cursor, limit or ORDER_PAGE_SIZE, with_total=with_total,
+            values=fields,
+        )
+    except InvalidCursor as e:
+        return {"error": str(e)}
+    return {"total_count": total_count, "next_cursor": next_cursor, "orders": rows}
+
+# Stream the user's orders (bought, or sold with side=seller) as CSV or JSONL
+@router.get("/export/")
+def export_orders_file(
+    request,
+    format: Literal[tuple(WRITERS)] = "csv",
+    side: Literal["buyer", "seller"] = "buyer",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    writer, content_type = WRITERS[format]
+    response = StreamingHttpResponse(writer(export_orders(request.auth, side, start, end)), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="orders-{side}.{format}"'
+    return response
 
 # Cancel an order
 @router.post("/cancel/{order_id}/")
+@idempotent
 def cancel_order(request, order_id: int):
     try:
-        order = Order.objects.get(id=order_id, buyer=request.auth)
-        if order.status == "Pending":
-            with transaction.atomic():
-                # Restore the offer quantity
-                offer = order.offer
-                offer.quantity += order.quantity
-                offer.is_active = True
-                offer.save()
-
-                # Update order status
-                order.status = "Cancelled"
-                order.save()
-
-            return {"message": "Order cancelled successfully", "order_id": order.id}
-        else:
-            return {"error": "Only pending orders can be cancelled"}
-    except Order.DoesNotExist:
-        return {"error": "Order not found"}
+        order = cancel_pending_order(order_id, request.auth)
+    except PlacementError as error:
+        return {"error": str(error)}
+    return {"message": "Order cancelled successfully", "order_id": order.id}
 
 # View a specific order's details
 @router.get("/{order_id}/")
@@ -106,12 +128,17 @@ def get_order_details(request, order_id: int):
 # Complete an order
 @router.post("/{order_id}/complete/")
 def complete_order(request, order_id: int):
-    try:
-        order = Order.objects.get(id=order_id, buyer=request.auth)
-        if order.status == "Pending":
-            order.status = "Completed"
-            order.save()
-            return {"message": "Order completed successfully", "order_id": order.id}
-        return {"error": "Order cannot be marked as completed"}
-    except Order.DoesNotExist:
-        return {"error": "Order not found"}
+    now = timezone.now()
+    with transaction.atomic():
+        # Conditional, like cancelling, so an order cancelled in the meantime
+        # is never completed as well.
+        if not Order.objects.filter(id=order_id, buyer=request.auth, status="Pending").update(
+            status="Completed", updated_at=now,
+        ):
+            if Order.objects.filter(id=order_id, buyer=request.auth).exists():
+                return {"error": "Order cannot be marked as completed"}
+            return {"error": "Order not found"}
+        order = Order.objects.get(id=order_id)
+        record_completed([order])
+        publish_order_events([order], "order.completed")
+    return {"message": "Order completed successfully", "order_id": order.id}
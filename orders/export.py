@@ -0,0 +1,67 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Order
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = {
+    "order_id": "id",
+    "created_at": "created_at",
+    "status": "status",
+    "offer_id": "offer_id",
+    "product": "offer__product__name",
+    "buyer": "buyer__username",
+    "quantity": "quantity",
+    "total_price": "total_price",
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_orders(user, side="buyer", start=None, end=None):
+    """Orders bought (``side="buyer"``) or sold by ``user``, oldest first, as export rows."""
+    if side == "seller":
+        orders = Order.objects.filter(offer__product__seller=user)
+    else:
+        orders = Order.objects.filter(buyer=user)
+    # Compare against datetimes rather than created_at__date so the
+    # created_at column stays usable by the indexes.
+    if start:
+        orders = orders.filter(created_at__gte=_midnight(start))
+    if end:
+        orders = orders.filter(created_at__lt=_midnight(end + timedelta(days=1)))
+    return orders.order_by("created_at", "id").values_list(*EXPORT_FIELDS.values())
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS.keys())
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    names = list(EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+WRITERS = {
+    "csv": (iter_csv, "text/csv"),
+    "jsonl": (iter_jsonl, "application/x-ndjson"),
+}
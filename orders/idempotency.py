@@ -0,0 +1,111 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from ninja.responses import NinjaJSONEncoder
+
+from .models import IdempotencyKey
+from .placement import retry_on_lock
+
+
+HEADER = "Idempotency-Key"
+
+DEFAULT_TTL = timedelta(hours=24)
+
+PURGE_BATCH_SIZE = 1000
+
+
+def get_ttl():
+    return getattr(settings, "IDEMPOTENCY_KEY_TTL", DEFAULT_TTL)
+
+
+def fingerprint(request):
+    """128-bit digest of what makes two requests "the same": method, path and body."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.method.encode(), request.path.encode(), request.body):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _replay(stored, request_fingerprint):
+    if stored.fingerprint != request_fingerprint:
+        return _error(f"{HEADER} was already used for a different request", 422)
+    response = JsonResponse(stored.response, status=stored.status_code, safe=False)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _find(user, key, now):
+    return IdempotencyKey.objects.filter(user=user, key=key, expires_at__gt=now).first()
+
+
+def _run_once(view, request, key, request_fingerprint, args, kwargs):
+    now = timezone.now()
+    with transaction.atomic():
+        # Expired but not purged yet: the key is free again.
+        IdempotencyKey.objects.filter(user=request.auth, key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                stored = IdempotencyKey.objects.create(
+                    user=request.auth, key=key, fingerprint=request_fingerprint, expires_at=now + get_ttl(),
+                )
+        except IntegrityError:
+            # A concurrent request with the same key committed first.
+            return _replay(_find(request.auth, key, now), request_fingerprint)
+
+        result = view(request, *args, **kwargs)
+        if isinstance(result, JsonResponse):
+            stored.status_code, stored.response = result.status_code, json.loads(result.content)
+        else:
+            stored.response = json.loads(json.dumps(result, cls=NinjaJSONEncoder))
+        stored.save(update_fields=["status_code", "response"])
+    return result
+
+
+def idempotent(view):
+    """
+    Make a POST view safe to retry. A request with an ``Idempotency-Key``
+    header that has been seen before gets the stored response back from one
+    lookup on the unique (user, key) index, without the view running. A new
+    key is stored in the same transaction as the view's own writes, so a
+    concurrent duplicate waits on the unique index and then replays, and a
+    failed request leaves no key behind. Reusing a key for a different
+    request is refused. Requests without the header pass straight through.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return _error(f"{HEADER} must be at most 255 characters", 400)
+
+        request_fingerprint = fingerprint(request)
+        stored = _find(request.auth, key, timezone.now())
+        if stored is not None:
+            return _replay(stored, request_fingerprint)
+        return retry_on_lock(_run_once, view, request, key, request_fingerprint, args, kwargs)
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=PURGE_BATCH_SIZE, now=None):
+    """Delete expired keys in batches, using the expires_at index. Returns the number deleted."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
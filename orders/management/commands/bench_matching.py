@@ -0,0 +1,41 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.matching import BookEntry, OrderBook
+
+
+class Command(BaseCommand):
+    help = "Measure in-memory matching throughput on synthetic order books (no database access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offers", type=int, default=200_000)
+        parser.add_argument("--products", type=int, default=100)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        start = timezone.now()
+        books = [OrderBook() for _ in range(options["products"])]
+
+        started = time.perf_counter()
+        for offer_id in range(options["offers"]):
+            side = rng.choice(("Buy", "Sell"))
+            # Overlapping price bands so roughly half the offers cross.
+            price = Decimal(rng.randint(900, 1100) if side == "Buy" else rng.randint(950, 1150))
+            product_id = rng.randrange(len(books))
+            books[product_id].upsert(BookEntry(
+                offer_id, product_id, side, price, start + timedelta(microseconds=offer_id), rng.randint(1, 50),
+                offer_id,  # a user per offer, so self-trade prevention never applies
+            ))
+        loaded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        fills = sum(len(book.match()) for book in books)
+        matched = time.perf_counter() - started
+
+        self.stdout.write(f"Inserted {options['offers']} offers in {loaded:.2f}s ({options['offers'] / loaded:,.0f}/s)")
+        self.stdout.write(f"Produced {fills} matches in {matched:.2f}s ({fills / matched:,.0f} matches/s)")
@@ -0,0 +1,107 @@
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from orders.models import Order, SellerDailySales
+from orders.placement import PlacementError, place_order
+from products.models import Category, Offer, Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one offer with concurrent create_order calls from several threads, then check that it "
+        "never oversold and report the sustained orders per second. Writes to the configured database "
+        "and removes its data afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--stock", type=int, default=2000, help="Quantity on the offer.")
+        parser.add_argument("--quantity", type=int, default=1, help="Units per order.")
+        parser.add_argument(
+            "--attempts", type=int, default=None,
+            help="Orders each thread tries to place (default: enough to oversubscribe the offer by 50%%).",
+        )
+
+    def handle(self, *args, **options):
+        threads, stock, quantity = options["threads"], options["stock"], options["quantity"]
+        attempts = options["attempts"] or -(-stock * 3 // (2 * threads * quantity))
+
+        seller = User.objects.create_user(username=f"loadtest-seller-{time.time_ns()}", password=None, role="farmer")
+        buyers = [
+            User.objects.create_user(username=f"loadtest-buyer-{time.time_ns()}-{i}", password=None, role="buyer")
+            for i in range(threads)
+        ]
+        category = Category.objects.create(name=f"loadtest-{time.time_ns()}")
+        product = Product.objects.create(name="Load test", description="", category=category, price=1, stock=stock,
+                                         seller=seller)
+        offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=1, quantity=stock, min_order=1, max_order=stock,
+            created_by=seller, expires_at=timezone.now() + timedelta(days=1),
+        )
+        try:
+            self.run(offer, buyers, attempts, quantity)
+        finally:
+            category.delete()
+            SellerDailySales.objects.filter(seller=seller).delete()
+            User.objects.filter(id__in=[seller.id, *(buyer.id for buyer in buyers)]).delete()
+
+    def run(self, offer, buyers, attempts, quantity):
+        start = threading.Barrier(len(buyers))
+        latencies, rejected, errors = [], [0], []
+        lock = threading.Lock()
+
+        def worker(buyer):
+            close_old_connections()
+            mine, refused = [], 0
+            try:
+                start.wait()
+                for _ in range(attempts):
+                    started = time.perf_counter()
+                    try:
+                        place_order(buyer, offer.id, quantity)
+                        mine.append(time.perf_counter() - started)
+                    except PlacementError:
+                        refused += 1
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(mine)
+                    rejected[0] += refused
+
+        workers = [threading.Thread(target=worker, args=(buyer,)) for buyer in buyers]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        offer.refresh_from_db()
+        sold = Order.objects.filter(offer=offer).aggregate(total=Sum("quantity"))["total"] or 0
+        initial = offer.max_order
+        self.stdout.write(
+            f"{len(buyers)} threads x {attempts} attempts: {len(latencies)} orders placed, {rejected[0]} refused, "
+            f"{len(errors)} errors in {elapsed:.2f}s"
+        )
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f"{len(latencies) / elapsed:,.0f} orders/s, latency median {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms"
+            )
+        self.stdout.write(f"Offer quantity {initial} -> {offer.quantity}, sold {sold}, active={offer.is_active}")
+        if errors:
+            raise CommandError(f"Workers failed: {errors[0]!r}")
+        if sold + offer.quantity != initial or offer.quantity < 0:
+            raise CommandError("Oversold: the sold quantity and the remaining quantity do not add up")
+        self.stdout.write(self.style.SUCCESS("No overselling"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.idempotency import PURGE_BATCH_SIZE, purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses that are past their TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep running and purge every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = purge_expired_keys(batch_size=options["batch_size"])
+            self.stdout.write(f"Purged {deleted} expired idempotency keys")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.sales import REBUILD_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the SellerDailySales rollup from the orders table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild(batch_size=options["batch_size"])
+        self.stdout.write(f"Wrote {written} seller/day rows in {time.perf_counter() - started:.2f} s")
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.matching import MatchingEngine
+
+
+class Command(BaseCommand):
+    help = "Match crossing Buy and Sell offers into orders. Run a single instance."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between matching rounds.")
+        parser.add_argument("--once", action="store_true", help="Run one matching round and exit.")
+        parser.add_argument(
+            "--verify", action="store_true",
+            help="Rebuild the books, check them against the database and exit without matching.",
+        )
+
+    def handle(self, *args, **options):
+        engine = MatchingEngine()
+        started = time.perf_counter()
+        engine.rebuild()
+        offers = sum(len(book) for book in engine.books.values())
+        self.stdout.write(
+            f"Loaded {offers} offers for {len(engine.books)} products in {time.perf_counter() - started:.2f}s"
+        )
+
+        if options["verify"]:
+            differences = engine.verify()
+            for kind, offer_ids in differences.items():
+                self.stdout.write(f"{kind}: {len(offer_ids)} {offer_ids[:20]}")
+            return
+
+        while True:
+            started = time.perf_counter()
+            fills = engine.run_once()
+            if fills:
+                self.stdout.write(f"Created {len(fills)} orders in {(time.perf_counter() - started) * 1000:.1f} ms")
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
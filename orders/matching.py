@@ -0,0 +1,294 @@
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications.outbox import publish_order_events
+from products.cache import invalidate
+from products.models import Offer
+from .models import Order
+from .sales import record_created
+
+
+OFFER_FIELDS = (
+    "id", "product_id", "offer_type", "price_per_unit", "quantity", "created_at", "created_by_id", "expires_at",
+    "min_order", "max_order",
+)
+
+# updated_at is set before a writer commits, so each refresh looks back this
+# far to catch rows that committed after the previous refresh started.
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+@dataclass
+class BookEntry:
+    offer_id: int
+    product_id: int
+    side: str  # "Buy" or "Sell"
+    price: Decimal
+    created_at: datetime
+    quantity: int
+    user_id: int
+    expires_at: datetime | None = None
+    min_order: int = 1
+    max_order: int | None = None
+    version: int = 0
+
+    def is_live(self, now):
+        return self.expires_at is None or self.expires_at > now
+
+
+@dataclass
+class Fill:
+    product_id: int
+    buy_offer_id: int
+    sell_offer_id: int
+    buyer_id: int
+    quantity: int
+    price: Decimal
+
+
+class OrderBook:
+    """
+    Price-time priority book for one product. Bids and asks are heaps;
+    removed, re-priced or expired entries are left in the heap and skipped
+    lazily when they surface, so every operation is O(log n).
+    """
+
+    def __init__(self):
+        self.bids = []  # (-price, created_at, offer_id, version)
+        self.asks = []  # (price, created_at, offer_id, version)
+        self.entries = {}
+        self._versions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def upsert(self, entry):
+        current = self.entries.get(entry.offer_id)
+        if current and current.price == entry.price and current.side == entry.side:
+            current.quantity = entry.quantity
+            current.min_order, current.max_order = entry.min_order, entry.max_order
+        else:
+            self._versions += 1
+            entry.version = self._versions
+            self.entries[entry.offer_id] = entry
+            if entry.side == "Buy":
+                heapq.heappush(self.bids, (-entry.price, entry.created_at, entry.offer_id, entry.version))
+            else:
+                heapq.heappush(self.asks, (entry.price, entry.created_at, entry.offer_id, entry.version))
+        if entry.quantity <= 0:
+            self.remove(entry.offer_id)
+
+    def remove(self, offer_id):
+        self.entries.pop(offer_id, None)
+
+    def _top(self, heap, now):
+        while heap:
+            _, _, offer_id, version = heap[0]
+            entry = self.entries.get(offer_id)
+            if entry is not None and entry.version == version:
+                if entry.is_live(now):
+                    return entry
+                # Expired but not swept yet: it can no longer be filled.
+                self.remove(offer_id)
+            heapq.heappop(heap)
+        return None
+
+    def best_bid(self, now=None):
+        return self._top(self.bids, now or timezone.now())
+
+    def best_ask(self, now=None):
+        return self._top(self.asks, now or timezone.now())
+
+    def match(self, now=None):
+        """
+        Cross the book until no bid can trade with a crossing ask. A bid and
+        an ask only trade if they belong to different users and a fill can
+        respect both offers' min_order and max_order; a bid with no such ask
+        is set aside for the rest of the round, so it does not block the
+        bids behind it.
+        """
+        now = now or timezone.now()
+        fills, set_aside = [], []
+        while True:
+            bid = self.best_bid(now)
+            if bid is None:
+                break
+            ask, crossed = self._counterparty(bid, now)
+            if ask is None:
+                if not crossed:
+                    break  # nothing crosses this bid, so nothing crosses the ones below it
+                set_aside.append(heapq.heappop(self.bids))
+                continue
+            # The resting (older) offer sets the trade price.
+            maker = bid if (bid.created_at, bid.offer_id) < (ask.created_at, ask.offer_id) else ask
+            quantity = fill_quantity(bid, ask)
+            fills.append(Fill(ask.product_id, bid.offer_id, ask.offer_id, bid.user_id, quantity, maker.price))
+            for entry in (bid, ask):
+                entry.quantity -= quantity
+                if entry.quantity == 0:
+                    self.remove(entry.offer_id)
+        for item in set_aside:
+            heapq.heappush(self.bids, item)
+        return fills
+
+    def _counterparty(self, bid, now):
+        """
+        The best ask ``bid`` can trade with, and whether any ask crossed it.
+        Asks passed over on the way are pushed back.
+        """
+        passed, found = [], None
+        while True:
+            ask = self._top(self.asks, now)
+            if ask is None or ask.price > bid.price:
+                break
+            if fill_quantity(bid, ask):
+                found = ask
+                break
+            passed.append(heapq.heappop(self.asks))
+        for item in passed:
+            heapq.heappush(self.asks, item)
+        return found, bool(found or passed)
+
+
+def fill_quantity(bid, ask):
+    """
+    How much ``bid`` and ``ask`` can trade in one order: their remaining
+    quantity capped by both max_orders, or 0 if that is below either
+    min_order or both offers belong to the same user.
+    """
+    if bid.user_id == ask.user_id:
+        return 0
+    quantity = min(bid.quantity, ask.quantity, *(
+        entry.max_order for entry in (bid, ask) if entry.max_order is not None
+    ))
+    return quantity if quantity >= max(bid.min_order, ask.min_order) else 0
+
+
+def entry_from_row(row):
+    offer_id, product_id, side, price, quantity, created_at, user_id, expires_at, min_order, max_order = row
+    return BookEntry(offer_id, product_id, side, price, created_at, quantity, user_id, expires_at, min_order, max_order)
+
+
+class MatchingEngine:
+    """
+    In-memory books for every product with active offers. The database stays
+    the source of truth: the engine is rebuilt from it at startup, follows
+    changes through ``Offer.updated_at`` and writes fills with conditional
+    decrements, so it must run in a single process.
+    """
+
+    def __init__(self):
+        self.books = defaultdict(OrderBook)
+        self.watermark = None
+
+    def active_offers(self):
+        return Offer.objects.filter(is_active=True, quantity__gt=0, expires_at__gt=timezone.now())
+
+    def rebuild(self, product_ids=None):
+        offers = self.active_offers()
+        if product_ids is None:
+            self.books.clear()
+            self.watermark = timezone.now()
+        else:
+            offers = offers.filter(product_id__in=product_ids)
+            for product_id in product_ids:
+                self.books.pop(product_id, None)
+        for row in offers.values_list(*OFFER_FIELDS).iterator(chunk_size=2000):
+            entry = entry_from_row(row)
+            self.books[entry.product_id].upsert(entry)
+
+    def refresh(self):
+        """Apply offers created or changed since the last refresh."""
+        if self.watermark is None:
+            return self.rebuild()
+        changed = Offer.objects.filter(updated_at__gte=self.watermark - REFRESH_OVERLAP)
+        now = self.watermark = timezone.now()
+        for row in changed.values_list(*OFFER_FIELDS, "is_active").iterator(chunk_size=2000):
+            entry = entry_from_row(row[:-1])
+            if row[-1] and entry.is_live(now):
+                self.books[entry.product_id].upsert(entry)
+            else:
+                self.books[entry.product_id].remove(entry.offer_id)
+
+    def match(self):
+        now = timezone.now()
+        fills = []
+        for book in self.books.values():
+            fills.extend(book.match(now))
+        return fills
+
+    def persist(self, fills):
+        """
+        Write ``fills`` in one transaction. A fill whose offers no longer have
+        the quantity in the database is dropped and its product's book is
+        reloaded, so the engine converges back on the database.
+        """
+        if not fills:
+            return []
+        persisted, stale = [], set()
+        now = timezone.now()
+        with transaction.atomic():
+            for fill in fills:
+                if fill.product_id in stale:
+                    continue
+                with transaction.atomic():
+                    updated = Offer.objects.filter(
+                        id__in=[fill.buy_offer_id, fill.sell_offer_id], is_active=True, expires_at__gt=now,
+                        quantity__gte=fill.quantity,
+                    ).update(quantity=F("quantity") - fill.quantity, updated_at=now)
+                    if updated != 2:
+                        transaction.set_rollback(True)
+                        stale.add(fill.product_id)
+                        continue
+                persisted.append(fill)
+
+            orders = Order.objects.bulk_create([
+                Order(
+                    buyer_id=fill.buyer_id,
+                    offer_id=fill.sell_offer_id,
+                    quantity=fill.quantity,
+                    total_price=fill.quantity * fill.price,
+                    status="Pending",
+                )
+                for fill in persisted
+            ])
+            record_created(orders)
+            publish_order_events(orders, "order.created")
+            touched = {fill.buy_offer_id for fill in persisted} | {fill.sell_offer_id for fill in persisted}
+            Offer.objects.filter(id__in=touched, quantity=0).update(is_active=False, updated_at=now)
+
+        if persisted:
+            invalidate("offers", "offer_detail")
+        if stale:
+            self.rebuild(stale)
+        return persisted
+
+    def run_once(self):
+        self.refresh()
+        return self.persist(self.match())
+
+    def verify(self):
+        """Compare the in-memory books with the database; empty lists mean they agree."""
+        now = timezone.now()
+        in_memory = {
+            entry.offer_id: (entry.price, entry.quantity)
+            for book in self.books.values() for entry in book.entries.values() if entry.is_live(now)
+        }
+        in_db = {
+            offer_id: (price, quantity)
+            for offer_id, price, quantity in self.active_offers().values_list("id", "price_per_unit", "quantity")
+        }
+        return {
+            "missing": sorted(set(in_db) - set(in_memory)),
+            "extra": sorted(set(in_memory) - set(in_db)),
+            "mismatched": sorted(
+                offer_id for offer_id in set(in_db) & set(in_memory) if in_db[offer_id] != in_memory[offer_id]
+            ),
+        }
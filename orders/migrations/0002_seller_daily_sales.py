@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_seller_daily_sales(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    SellerDailySales = apps.get_model("orders", "SellerDailySales")
+
+    live = ~Q(status="Cancelled")
+    completed = Q(status="Completed")
+    rows = (
+        Order.objects.values(seller_id=F("offer__product__seller_id"), date=TruncDate("created_at"))
+        .annotate(
+            orders_count=Count("id", filter=live),
+            revenue=Sum("total_price", filter=live, default=0),
+            completed_count=Count("id", filter=completed),
+            completed_revenue=Sum("total_price", filter=completed, default=0),
+            cancelled_count=Count("id", filter=Q(status="Cancelled")),
+        )
+        .order_by()
+    )
+    SellerDailySales.objects.bulk_create([SellerDailySales(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('completed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('seller', 'date'), name='unique_seller_daily_sales')],
+            },
+        ),
+        migrations.RunPython(backfill_seller_daily_sales, migrations.RunPython.noop),
+    ]
@@ -15,3 +15,54 @@ class Order(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="Pending")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Order history pages and exports, newest first, per buyer
+            models.Index(fields=["buyer", "created_at", "id"], name="order_buyer_created_idx"),
+            # Seller exports reach orders through their offers
+            models.Index(fields=["offer", "created_at", "id"], name="order_offer_created_idx"),
+        ]
+
+
+class SellerDailySales(models.Model):
+    """
+    Per-seller, per-day order totals kept in step with Order by orders.sales,
+    keyed by the day the order was placed. Cancelled orders are taken back
+    out of orders_count and revenue and counted in cancelled_count.
+    """
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_sales")
+    date = models.DateField()
+    orders_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_count = models.IntegerField(default=0)
+    completed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index behind per-seller date range reads.
+            models.UniqueConstraint(fields=["seller", "date"], name="unique_seller_daily_sales"),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a request made with an ``Idempotency-Key`` header, kept
+    until ``expires_at`` so client retries replay it (see orders.idempotency).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=32)
+    status_code = models.PositiveSmallIntegerField(default=200)
+    response = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expires_idx"),
+        ]
@@ -0,0 +1,211 @@
+import logging
+import random
+import time
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications.outbox import publish_order_events
+from products.cache import invalidate
+from products.models import Offer, Product
+from .models import Order
+from .sales import record_cancelled, record_created
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_RETRIES = 6
+LOCK_BACKOFF = 0.01
+
+
+class PlacementError(Exception):
+    pass
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+def retry_on_lock(func, *args, retries=LOCK_RETRIES, backoff=LOCK_BACKOFF, **kwargs):
+    """
+    Call ``func`` and retry it with jittered exponential backoff when SQLite
+    reports the database as locked. ``func`` must run its own transaction;
+    inside an outer atomic block the error is raised straight away because
+    the outer transaction is already broken.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as error:
+            if attempt == retries or not is_lock_error(error) or connection.in_atomic_block:
+                raise
+            delay = backoff * 2 ** attempt
+            logger.info("Database locked, retrying %s in %.3fs", func.__name__, delay)
+            time.sleep(random.uniform(delay / 2, delay))
+
+
+def _take(offer_id, quantity, now):
+    """
+    Decrement the offer by ``quantity`` if enough is left. The UPDATE is the
+    first statement of the transaction, so it takes the row lock (the write
+    lock on SQLite) before anything is read and concurrent buyers queue on
+    it instead of overselling.
+    """
+    return Offer.objects.filter(
+        id=offer_id, is_active=True, expires_at__gt=now, quantity__gte=quantity,
+    ).update(quantity=F("quantity") - quantity, updated_at=now)
+
+
+def _why_not_taken(offer_id, now):
+    if Offer.objects.filter(id=offer_id, is_active=True, expires_at__gt=now).exists():
+        return "Not enough quantity available in the offer"
+    return "Offer not found or no longer active"
+
+
+def _place_order(buyer, offer_id, quantity):
+    now = timezone.now()
+    with transaction.atomic():
+        if not _take(offer_id, quantity, now):
+            raise PlacementError(_why_not_taken(offer_id, now))
+        offer = Offer.objects.filter(id=offer_id).values("price_per_unit", "quantity", "product__name").get()
+        if offer["quantity"] == 0:
+            Offer.objects.filter(id=offer_id, quantity=0).update(is_active=False, updated_at=now)
+        order = Order.objects.create(
+            buyer=buyer,
+            offer_id=offer_id,
+            quantity=quantity,
+            total_price=quantity * offer["price_per_unit"],
+            status="Pending",
+        )
+        record_created([order])
+        publish_order_events([order], "order.created")
+    # Queryset updates skip the Offer signals, so drop cached pages here.
+    invalidate("offers", f"offer:{offer_id}")
+    return order, offer["product__name"]
+
+
+def place_order(buyer, offer_id, quantity):
+    """
+    Order ``quantity`` units of an active offer. Returns ``(order, product_name)``
+    or raises PlacementError when the offer cannot fill the order.
+    """
+    if quantity < 1:
+        raise PlacementError("Quantity must be at least 1")
+    return retry_on_lock(_place_order, buyer, offer_id, quantity)
+
+
+def _cancel_order(order_id, buyer):
+    now = timezone.now()
+    with transaction.atomic():
+        if not Order.objects.filter(id=order_id, buyer=buyer, status="Pending").update(status="Cancelled", updated_at=now):
+            if Order.objects.filter(id=order_id, buyer=buyer).exists():
+                raise PlacementError("Only pending orders can be cancelled")
+            raise PlacementError("Order not found")
+        order = Order.objects.get(id=order_id)
+        # An expired offer stays closed; the sweeper hands its quantity back
+        # to the product, so the cancelled units go straight there as well.
+        restored = Offer.objects.filter(id=order.offer_id, expires_at__gt=now).update(
+            quantity=F("quantity") + order.quantity, is_active=True, updated_at=now,
+        )
+        if not restored:
+            offer = Offer.objects.filter(id=order.offer_id).values("product_id", "offer_type").get()
+            if offer["offer_type"] == "Sell":
+                Product.objects.filter(id=offer["product_id"]).update(
+                    stock=F("stock") + order.quantity, updated_at=now,
+                )
+        record_cancelled([order])
+        publish_order_events([order], "order.cancelled")
+    invalidate("offers", f"offer:{order.offer_id}")
+    return order
+
+
+def cancel_pending_order(order_id, buyer):
+    """Cancel a pending order and give its quantity back to the offer."""
+    return retry_on_lock(_cancel_order, order_id, buyer)
+
+
+CHECKOUT_MODES = ("all_or_nothing", "partial")
+
+
+class _CheckoutAborted(Exception):
+    def __init__(self, results):
+        self.results = results
+
+
+def _checkout(buyer, lines, mode):
+    now = timezone.now()
+    results = [{"offer_id": offer_id, "quantity": quantity} for offer_id, quantity in lines]
+    # Visit offers in id order so two checkouts sharing offers take their
+    # locks in the same order and cannot deadlock.
+    order = sorted(range(len(lines)), key=lambda index: (lines[index][0], index))
+    offer_ids = sorted({offer_id for offer_id, _ in lines})
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            list(Offer.objects.select_for_update().filter(id__in=offer_ids).order_by("id").values_list("id"))
+
+        taken = []
+        for index in order:
+            offer_id, quantity = lines[index]
+            if quantity < 1:
+                results[index].update(status="rejected", error="Quantity must be at least 1")
+            elif _take(offer_id, quantity, now):
+                taken.append(index)
+            else:
+                results[index].update(status="rejected", error=_why_not_taken(offer_id, now))
+
+        if mode == "all_or_nothing" and len(taken) < len(lines):
+            for result in results:
+                result.setdefault("status", "not_placed")
+            raise _CheckoutAborted(results)
+
+        offers = {
+            row["id"]: row
+            for row in Offer.objects.filter(id__in={lines[index][0] for index in taken}).values(
+                "id", "price_per_unit", "quantity", "product__name",
+            )
+        }
+        sold_out = [offer_id for offer_id, row in offers.items() if row["quantity"] == 0]
+        if sold_out:
+            Offer.objects.filter(id__in=sold_out, quantity=0).update(is_active=False, updated_at=now)
+
+        orders = Order.objects.bulk_create([
+            Order(
+                buyer=buyer,
+                offer_id=lines[index][0],
+                quantity=lines[index][1],
+                total_price=lines[index][1] * offers[lines[index][0]]["price_per_unit"],
+                status="Pending",
+            )
+            for index in taken
+        ])
+        record_created(orders)
+        publish_order_events(orders, "order.created")
+
+    for index, placed in zip(taken, orders):
+        results[index].update(
+            status="placed",
+            order_id=placed.id,
+            total_price=placed.total_price,
+            offer=offers[placed.offer_id]["product__name"],
+        )
+    if offers:
+        invalidate("offers", *(f"offer:{offer_id}" for offer_id in offers))
+    return results
+
+
+def checkout(buyer, lines, mode="all_or_nothing"):
+    """
+    Place one order per ``(offer_id, quantity)`` line in a single transaction
+    and return a result per line, in the order given. In "all_or_nothing"
+    mode one line that cannot be filled cancels the whole checkout; in
+    "partial" mode the lines that can be filled are placed.
+    """
+    if mode not in CHECKOUT_MODES:
+        raise PlacementError(f"Unknown checkout mode '{mode}'")
+    try:
+        return retry_on_lock(_checkout, buyer, list(lines), mode)
+    except _CheckoutAborted as aborted:
+        return aborted.results
@@ -0,0 +1,98 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from products.models import Offer
+from users.dashboard import invalidate_dashboards
+from .models import Order, SellerDailySales
+
+
+REBUILD_BATCH_SIZE = 1000
+
+ZERO = Decimal("0")
+
+
+def _offer_owners(orders):
+    offer_ids = {order.offer_id for order in orders}
+    rows = Offer.objects.filter(id__in=offer_ids).values_list("id", "product__seller_id", "created_by_id")
+    return {offer_id: (seller_id, creator_id) for offer_id, seller_id, creator_id in rows}
+
+
+def _apply(orders, **changes):
+    """
+    Add to the rollup rows of ``orders``. Each keyword names a column and
+    maps to "count" (one per order) or "revenue" (the order total), with a
+    leading "-" to subtract. Call inside the transaction that changes the orders.
+
+    Every order write passes through here, so this also drops the cached
+    dashboards of the buyers, sellers and offer creators involved.
+    """
+    if not orders:
+        return
+    owners = _offer_owners(orders)
+    sellers = {offer_id: seller_id for offer_id, (seller_id, _) in owners.items()}
+    invalidate_dashboards(
+        *{order.buyer_id for order in orders},
+        *{user_id for pair in owners.values() for user_id in pair},
+    )
+    deltas = defaultdict(lambda: defaultdict(lambda: ZERO))
+    for order in orders:
+        key = (sellers[order.offer_id], timezone.localdate(order.created_at))
+        for column, source in changes.items():
+            sign = -1 if source.startswith("-") else 1
+            amount = 1 if source.lstrip("-") == "count" else order.total_price
+            deltas[key][column] += sign * amount
+
+    for (seller_id, day), delta in sorted(deltas.items()):
+        increments = {column: F(column) + value for column, value in delta.items()}
+        if SellerDailySales.objects.filter(seller_id=seller_id, date=day).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                SellerDailySales.objects.create(seller_id=seller_id, date=day, **delta)
+        except IntegrityError:
+            SellerDailySales.objects.filter(seller_id=seller_id, date=day).update(**increments)
+
+
+def record_created(orders):
+    _apply(orders, orders_count="count", revenue="revenue")
+
+
+def record_cancelled(orders):
+    _apply(orders, orders_count="-count", revenue="-revenue", cancelled_count="count")
+
+
+def record_completed(orders):
+    _apply(orders, completed_count="count", completed_revenue="revenue")
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute the whole rollup from Order. Returns the number of rows written."""
+    live = ~Q(status="Cancelled")
+    completed = Q(status="Completed")
+    rows = (
+        Order.objects.values(seller_id=F("offer__product__seller_id"), date=TruncDate("created_at"))
+        .annotate(
+            orders_count=Count("id", filter=live),
+            revenue=Sum("total_price", filter=live, default=ZERO),
+            completed_count=Count("id", filter=completed),
+            completed_revenue=Sum("total_price", filter=completed, default=ZERO),
+            cancelled_count=Count("id", filter=Q(status="Cancelled")),
+        )
+        .order_by()
+    )
+    written = 0
+    with transaction.atomic():
+        SellerDailySales.objects.all().delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(SellerDailySales(**row))
+            if len(batch) >= batch_size:
+                written += len(SellerDailySales.objects.bulk_create(batch))
+                batch = []
+        written += len(SellerDailySales.objects.bulk_create(batch))
+    return written
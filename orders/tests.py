@@ -1,3 +1,404 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.db import OperationalError
 from django.test import TestCase
+from django.utils import timezone
+from ninja_jwt.tokens import RefreshToken
+
+from products.cache import get_cache
+from products.expiry import sweep_expired_offers
+from products.models import Category, Offer, Product
+from users.models import User
+from .idempotency import purge_expired_keys
+from .matching import MatchingEngine
+from .models import IdempotencyKey, Order, SellerDailySales
+from .placement import PlacementError, cancel_pending_order, place_order, retry_on_lock
+from .sales import rebuild
+
+
+class SellerDailySalesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.buyer = User.objects.create_user(username="buyer", password="secret", role="buyer")
+        category = Category.objects.create(name="Crop")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100, seller=cls.seller,
+        )
+        cls.offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=5, quantity=100, min_order=1, max_order=50,
+            created_by=cls.seller, expires_at=timezone.now() + timedelta(days=7),
+        )
+
+    def setUp(self):
+        get_cache().clear()
+
+    def post(self, url, user, data=None):
+        token = RefreshToken.for_user(user).access_token
+        response = self.client.post(url, data or {}, content_type="application/json",
+                                    headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def order(self, quantity):
+        return self.post("/api/orders/create/", self.buyer, {"offer_id": self.offer.id, "quantity": quantity})["order_id"]
+
+    def rollup(self):
+        return list(SellerDailySales.objects.values(
+            "seller_id", "date", "orders_count", "revenue", "completed_count", "completed_revenue", "cancelled_count",
+        ))
+
+    def test_order_lifecycle_updates_rollup(self):
+        first, second, third = self.order(2), self.order(3), self.order(4)
+        self.post(f"/api/orders/cancel/{second}/", self.buyer)
+        self.post(f"/api/orders/{third}/complete/", self.buyer)
+
+        day = SellerDailySales.objects.get(seller=self.seller, date=timezone.localdate())
+        self.assertEqual((day.orders_count, day.revenue), (2, 30))
+        self.assertEqual((day.completed_count, day.completed_revenue), (1, 20))
+        self.assertEqual(day.cancelled_count, 1)
+
+        incremental = self.rollup()
+        rebuild()
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_cancelled_orders_cannot_be_completed(self):
+        order_id = self.order(2)
+        self.post(f"/api/orders/cancel/{order_id}/", self.buyer)
+        response = self.post(f"/api/orders/{order_id}/complete/", self.buyer)
+        self.assertEqual(response, {"error": "Order cannot be marked as completed"})
+
+        self.assertEqual(Order.objects.get(id=order_id).status, "Cancelled")
+        day = SellerDailySales.objects.get(seller=self.seller)
+        self.assertEqual((day.orders_count, day.cancelled_count, day.completed_count), (0, 1, 0))
+
+    def test_analytics_reads_window_from_rollup(self):
+        self.order(2)
+        SellerDailySales.objects.create(
+            seller=self.seller, date=timezone.localdate() - timedelta(days=30), orders_count=4, revenue=80,
+        )
+        token = RefreshToken.for_user(self.seller).access_token
+        headers = {"Authorization": f"Bearer {token}"}
+
+        with self.assertNumQueries(2):  # the user, then one range read of the rollup
+            recent = self.client.get("/api/products/analytics/", headers=headers).json()
+        self.assertEqual((recent["sales_count"], recent["total_revenue"]), (1, "10.00"))
+
+        start = (timezone.localdate() - timedelta(days=60)).isoformat()
+        window = self.client.get(f"/api/products/analytics/?start={start}", headers=headers).json()
+        self.assertEqual(window["sales_count"], 5)
+        self.assertEqual(len(window["recent_sales"]), 2)
+
+
+class OrderPlacementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.buyer = User.objects.create_user(username="buyer", password="secret", role="buyer")
+        category = Category.objects.create(name="Crop")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100, seller=cls.seller,
+        )
+        cls.offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=5, quantity=3, min_order=1, max_order=3,
+            created_by=cls.seller, expires_at=timezone.now() + timedelta(days=7),
+        )
+
+    def test_refuses_more_than_is_left(self):
+        place_order(self.buyer, self.offer.id, 2)
+        with self.assertRaisesMessage(PlacementError, "Not enough quantity"):
+            place_order(self.buyer, self.offer.id, 2)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.quantity, 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_refuses_non_positive_quantities(self):
+        with self.assertRaises(PlacementError):
+            place_order(self.buyer, self.offer.id, -5)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.quantity, 3)
+
+    def test_selling_out_deactivates_the_offer(self):
+        order, product_name = place_order(self.buyer, self.offer.id, 3)
+        self.assertEqual((order.total_price, product_name), (15, "Maize"))
+        self.offer.refresh_from_db()
+        self.assertEqual((self.offer.quantity, self.offer.is_active), (0, False))
+        with self.assertRaisesMessage(PlacementError, "no longer active"):
+            place_order(self.buyer, self.offer.id, 1)
+
+    def test_cancelling_against_an_expired_offer_returns_stock_once(self):
+        order, _ = place_order(self.buyer, self.offer.id, 2)
+        Offer.objects.filter(id=self.offer.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        sweep_expired_offers()
+        cancel_pending_order(order.id, self.buyer)
+        self.assertEqual(sweep_expired_offers().offers, 0)
+
+        self.offer.refresh_from_db()
+        self.assertFalse(self.offer.is_active)
+        # 100 in stock, plus the 1 unit left on the offer and the 2 cancelled.
+        self.assertEqual(Product.objects.get(id=self.offer.product_id).stock, 103)
+
+    @mock.patch("orders.placement.time.sleep")
+    def test_retries_when_the_database_is_locked(self, sleep):
+        func = mock.Mock(side_effect=[OperationalError("database is locked"), "placed"], __name__="func")
+        with mock.patch("orders.placement.connection.in_atomic_block", False):
+            self.assertEqual(retry_on_lock(func), "placed")
+        self.assertEqual(func.call_count, 2)
+        sleep.assert_called_once()
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.buyer = User.objects.create_user(username="buyer", password="secret", role="buyer")
+        category = Category.objects.create(name="Crop")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100, seller=seller,
+        )
+        cls.offers = [
+            Offer.objects.create(
+                product=product, offer_type="Sell", price_per_unit=price, quantity=5, min_order=1, max_order=5,
+                created_by=seller, expires_at=timezone.now() + timedelta(days=7),
+            )
+            for price in (2, 3)
+        ]
+
+    def checkout(self, lines, mode):
+        token = RefreshToken.for_user(self.buyer).access_token
+        response = self.client.post(
+            "/api/orders/checkout/", {"lines": lines, "mode": mode}, content_type="application/json",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def quantities(self):
+        return list(Offer.objects.order_by("id").values_list("quantity", flat=True))
+
+    def test_all_or_nothing_places_nothing_when_a_line_fails(self):
+        first, second = self.offers
+        result = self.checkout(
+            [{"offer_id": second.id, "quantity": 2}, {"offer_id": first.id, "quantity": 9}], "all_or_nothing",
+        )
+        self.assertEqual(result["placed"], 0)
+        self.assertEqual([line["status"] for line in result["lines"]], ["not_placed", "rejected"])
+        self.assertEqual(self.quantities(), [5, 5])
+        self.assertFalse(Order.objects.exists())
+
+    def test_partial_places_the_lines_that_fit(self):
+        first, second = self.offers
+        result = self.checkout(
+            [
+                {"offer_id": second.id, "quantity": 2},
+                {"offer_id": first.id, "quantity": 9},
+                {"offer_id": second.id, "quantity": 3},
+            ],
+            "partial",
+        )
+        self.assertEqual([line["status"] for line in result["lines"]], ["placed", "rejected", "placed"])
+        self.assertEqual(result["total_price"], "15.00")
+        self.assertEqual(self.quantities(), [5, 0])
+        self.assertFalse(Offer.objects.get(id=second.id).is_active)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.buyer = User.objects.create_user(username="buyer", password="secret", role="buyer")
+        category = Category.objects.create(name="Crop")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100, seller=seller,
+        )
+        cls.offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=5, quantity=10, min_order=1, max_order=10,
+            created_by=seller, expires_at=timezone.now() + timedelta(days=7),
+        )
+
+    def post(self, url, data, key):
+        token = RefreshToken.for_user(self.buyer).access_token
+        return self.client.post(url, data, content_type="application/json",
+                                headers={"Authorization": f"Bearer {token}", "Idempotency-Key": key})
+
+    def test_retry_replays_the_stored_response(self):
+        data = {"offer_id": self.offer.id, "quantity": 2}
+        first = self.post("/api/orders/create/", data, "key-1")
+        with self.assertNumQueries(2):  # the user, then the stored key
+            retry = self.post("/api/orders/create/", data, "key-1")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.quantity, 8)
+
+    def test_key_reused_for_another_request_is_refused(self):
+        self.post("/api/orders/create/", {"offer_id": self.offer.id, "quantity": 2}, "key-1")
+        response = self.post("/api/orders/create/", {"offer_id": self.offer.id, "quantity": 3}, "key-1")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_keys_are_purged(self):
+        self.post("/api/orders/create/", {"offer_id": self.offer.id, "quantity": 2}, "key-1")
+        self.assertEqual(purge_expired_keys(now=timezone.now() + timedelta(days=2)), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.buyer = User.objects.create_user(username="buyer", password="secret", role="buyer")
+        category = Category.objects.create(name="Crop")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100, seller=cls.seller,
+        )
+        offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=5, quantity=100, min_order=1, max_order=100,
+            created_by=cls.seller, expires_at=timezone.now() + timedelta(days=7),
+        )
+        cls.orders = [Order.objects.create(buyer=cls.buyer, offer=offer, quantity=i, total_price=5 * i) for i in range(1, 6)]
+
+    def get(self, url, user):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+    def test_list_orders_pages_with_a_cursor(self):
+        seen, url = [], "/api/orders/list/?limit=2"
+        while url:
+            page = self.get(url, self.buyer).json()
+            seen += [order["id"] for order in page["orders"]]
+            url = page["next_cursor"] and f"/api/orders/list/?limit=2&cursor={page['next_cursor']}"
+        self.assertEqual(seen, [order.id for order in reversed(self.orders)])
+
+    def test_list_orders_without_paging_returns_every_order(self):
+        page = self.get("/api/orders/list/", self.buyer).json()
+        self.assertEqual(list(page), ["orders"])
+        self.assertEqual([order["id"] for order in page["orders"]], [order.id for order in reversed(self.orders)])
+        # A cursor alone pages with the default size.
+        first = self.get("/api/orders/list/?limit=1", self.buyer).json()
+        rest = self.get(f"/api/orders/list/?cursor={first['next_cursor']}", self.buyer).json()
+        self.assertEqual(len(rest["orders"]), 4)
+
+    def test_export_streams_csv_and_jsonl(self):
+        response = self.get("/api/orders/export/", self.buyer)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["order_id", "created_at", "status"])
+        self.assertEqual(len(lines), 6)
+
+        response = self.get("/api/orders/export/?format=jsonl&side=seller", self.seller)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["quantity"] for row in rows], [1, 2, 3, 4, 5])
+        self.assertEqual(rows[0]["buyer"], "buyer")
+
+    def test_export_filters_by_date(self):
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        response = self.get(f"/api/orders/export/?format=jsonl&start={tomorrow}", self.buyer)
+        self.assertEqual(b"".join(response.streaming_content), b"")
+
+
+class MatchingEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.buyer = User.objects.create_user(username="buyer", password="secret", role="buyer")
+        category = Category.objects.create(name="Crop")
+        cls.product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100, seller=cls.seller,
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.engine = MatchingEngine()
+
+    def offer(self, offer_type, price, quantity, expires_in=timedelta(days=1), user=None, min_order=1, max_order=None):
+        user = user or (self.buyer if offer_type == "Buy" else self.seller)
+        return Offer.objects.create(
+            product=self.product, offer_type=offer_type, price_per_unit=price, quantity=quantity, min_order=min_order,
+            max_order=max_order or quantity, created_by=user, expires_at=timezone.now() + expires_in,
+        )
+
+    def fills(self):
+        return [(fill.buy_offer_id, fill.sell_offer_id, fill.quantity, fill.price) for fill in self.engine.match()]
+
+    def test_fills_by_price_then_time_with_partial_fills(self):
+        older_ask = self.offer("Sell", 9, 3)
+        cheap_ask = self.offer("Sell", 8, 2)
+        newer_ask = self.offer("Sell", 9, 4)
+        bid = self.offer("Buy", 10, 6)
+        self.engine.rebuild()
+        # Cheapest ask first, then the older of the two at 9, then the newer
+        # one for what is left. The asks rested first, so they set the price.
+        self.assertEqual(self.fills(), [
+            (bid.id, cheap_ask.id, 2, 8),
+            (bid.id, older_ask.id, 3, 9),
+            (bid.id, newer_ask.id, 1, 9),
+        ])
+        book = self.engine.books[self.product.id]
+        self.assertIsNone(book.best_bid())
+        self.assertEqual((book.best_ask().offer_id, book.best_ask().quantity), (newer_ask.id, 3))
+
+    def test_persist_writes_orders_and_remaining_quantities(self):
+        ask = self.offer("Sell", 9, 5)
+        bid = self.offer("Buy", 10, 3)
+        persisted = self.engine.run_once()
+        self.assertEqual(len(persisted), 1)
+
+        order = Order.objects.get()
+        self.assertEqual((order.buyer_id, order.offer_id, order.quantity, order.total_price), (
+            self.buyer.id, ask.id, 3, 27,
+        ))
+        remaining = dict(Offer.objects.values_list("id", "quantity"))
+        self.assertEqual((remaining[ask.id], remaining[bid.id]), (2, 0))
+        self.assertFalse(Offer.objects.get(id=bid.id).is_active)
+        self.assertEqual(self.engine.verify(), {"missing": [], "extra": [], "mismatched": []})
+
+    def test_refresh_follows_changed_offers(self):
+        ask = self.offer("Sell", 12, 5)
+        self.engine.rebuild()
+        bid = self.offer("Buy", 10, 3)
+        self.assertEqual(self.engine.run_once(), [])
+        Offer.objects.filter(id=ask.id).update(price_per_unit=10, updated_at=timezone.now())
+        self.engine.refresh()
+        self.assertEqual(self.fills(), [(bid.id, ask.id, 3, 10)])
+
+    def test_a_user_never_trades_with_themselves(self):
+        own_ask = self.offer("Sell", 9, 2)
+        other_ask = self.offer("Sell", 10, 2, user=self.buyer)
+        own_bid = self.offer("Buy", 10, 2, user=self.seller)
+        persisted = self.engine.run_once()
+        self.assertEqual([(fill.buy_offer_id, fill.sell_offer_id) for fill in persisted], [(own_bid.id, other_ask.id)])
+        order = Order.objects.get()
+        self.assertEqual((order.buyer_id, order.offer.created_by_id), (self.seller.id, self.buyer.id))
+        self.assertEqual(self.engine.books[self.product.id].best_ask().offer_id, own_ask.id)
+
+    def test_fills_respect_min_and_max_order(self):
+        ask = self.offer("Sell", 9, 10, min_order=5)
+        self.offer("Buy", 10, 3)
+        bid = self.offer("Buy", 10, 20, max_order=6)
+        self.engine.rebuild()
+        # The first bid is below the ask's minimum; the second takes at most
+        # its maximum, which leaves the ask less than its minimum.
+        self.assertEqual(self.fills(), [(bid.id, ask.id, 6, 9)])
+        self.assertEqual(self.fills(), [])
+        book = self.engine.books[self.product.id]
+        self.assertEqual((book.best_bid().quantity, book.best_ask().quantity), (3, 4))
 
-# Create your tests here.
+    def test_expired_offers_are_never_filled(self):
+        live_ask = self.offer("Sell", 9, 2)
+        bid = self.offer("Buy", 10, 2)
+        self.engine.rebuild()
+        self.offer("Sell", 5, 2, expires_in=-timedelta(minutes=1))  # still active until the sweeper runs
+        self.engine.refresh()
+        # Expires between the refresh and the match.
+        Offer.objects.filter(id=live_ask.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        book = self.engine.books[self.product.id]
+        book.entries[live_ask.id].expires_at = timezone.now() - timedelta(seconds=1)
+        self.assertEqual(self.fills(), [])
+        self.assertEqual(book.best_bid().offer_id, bid.id)
+        self.assertIsNone(book.best_ask())
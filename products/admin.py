@@ -5,3 +5,5 @@ from . import models
 admin.site.register(models.Category)
 admin.site.register(models.Product)
 admin.site.register(models.Offer)
+admin.site.register(models.Tag)
+admin.site.register(models.MediaBlob)
@@ -1,24 +1,49 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from ninja import Router
+from ninja import File, Router
+from ninja.files import UploadedFile
 from django.conf import settings
-from ninja_jwt.authentication import JWTAuth
-from django.db.models import Q, Sum, Count
-from orders.models import Order
-from datetime import datetime, timedelta
-
+from users.auth import CachedJWTAuth
+from django.db.models import F, Count, Max
+from django.db.models.functions import Lower
+from django.utils import timezone
+from orders.models import SellerDailySales
+from datetime import date, timedelta
+from decimal import Decimal
+
+from products.cache import CATEGORY_TIMEOUT, OFFER_DETAIL_TIMEOUT, OFFER_LIST_TIMEOUT, cached_response, stats
+from products.conditional import conditional
+from stebofarm_project.imports import READERS
 from products.schemas import CategoryCreateSchema, CategorySchema, OfferCreateSchema, ProductSchema
-from .models import Category, Offer, Product
+from .models import Category, CategoryPriceStats, Offer, Product
+from .pagination import OFFER_ORDERINGS, PRODUCT_ORDERINGS, SEARCH_ORDERINGS, InvalidCursor, paginate
+from .importer import IMPORT_BATCH_SIZE, import_products
+from .search import get_search_backend
+from .projections import MY_OFFERS, OFFER_DETAIL, OFFER_LIST, OFFER_SEARCH
+from .tags import filter_by_tags, tag_facets
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
+
 # router = Router(auth=JWTAuth())
 router = Router()
 public_offers = Router()
 
 
+def categories_named(name):
+    """Ids of categories matching ``name`` case-insensitively, via the Lower(name) index."""
+    return Category.objects.annotate(name_lower=Lower("name")).filter(name_lower=name.lower()).values("id")
+
+
+# Offer types are stored as "Buy"/"Sell"; normalizing the input lets the
+# filter be an exact match that can use the offer_type index.
+def normalize_offer_type(offer_type):
+    return offer_type.capitalize()
+
+
 
 # Add a new product
-@router.post("/add/")
+@router.post("/add/", auth=CachedJWTAuth())
 def add_product(request, data: ProductSchema):
     # Ensure the user has permission to add products
     if request.auth.role not in ["farmer", "supplier"]:
@@ -34,6 +59,30 @@ def add_product(request, data: ProductSchema):
     )
     return {"message": "Product added successfully", "id": product.id}
 
+# Bulk import products from a CSV or JSON Lines upload
+@router.post("/import/", auth=CachedJWTAuth())
+def bulk_import_products(
+    request,
+    file: UploadedFile = File(...),
+    format: Optional[str] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+):
+    """
+    Import products for the authenticated seller. Rows need name, category
+    (by name), price and stock, plus optional description and tags. The
+    upload is read row by row and inserted in batches.
+    """
+    if request.auth.role not in ["farmer", "supplier"]:
+        return {"error": "You are not allowed to add products"}
+    format = (format or file.name.rsplit(".", 1)[-1]).lower()
+    if format not in READERS:
+        return {"error": "Unsupported format, use 'csv' or 'jsonl'"}
+    if batch_size < 1:
+        return {"error": "batch_size must be positive"}
+
+    report = import_products(READERS[format](file.file), request.auth, batch_size=batch_size)
+    return report.as_dict()
+
 # List all products with filtering and pagination
 @router.get("/")
 def list_products(
@@ -42,61 +91,148 @@ def list_products(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     tags: Optional[str] = None,
+    tag_match: str = "any",  # "any" or "all" of the given tags
+    facets: bool = False,
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    ordering: str = "newest",
+    with_total: Optional[bool] = None,
 ):
     products = Product.objects.all()
 
     # Apply filters
     if category:
-        products = products.filter(category__iexact=category)
+        products = products.filter(category__in=categories_named(category))
     if min_price is not None:
         products = products.filter(price__gte=min_price)
     if max_price is not None:
         products = products.filter(price__lte=max_price)
     if tags:
-        tag_list = tags.split(",")
-        products = products.filter(tags__icontains=tag_list)
-
-    total_count = products.count()
-    products = products[offset:offset + limit]
+        if tag_match not in ("any", "all"):
+            return {"error": "tag_match must be 'any' or 'all'"}
+        products = filter_by_tags(products, tags, tag_match)
+
+    try:
+        rows, next_cursor, total_count = paginate(
+            products, PRODUCT_ORDERINGS, ordering, cursor, limit, offset, with_total,
+            values=("id", "name", "price", "stock", "category", "tags"),
+        )
+    except InvalidCursor as e:
+        return {"error": str(e)}
 
-    return {
+    response = {
         "total_count": total_count,
-        "products": list(products.values("id", "name", "price", "stock", "category", "tags"))
+        "next_cursor": next_cursor,
+        "products": rows,
     }
+    if facets:
+        response["tag_facets"] = tag_facets(products)
+    return response
 
 # Sales analytics
-@router.get("/analytics/")
-def get_sales_analytics(request):
+@router.get("/analytics/", auth=CachedJWTAuth())
+def get_sales_analytics(request, start: Optional[date] = None, end: Optional[date] = None, days: int = 7):
+    """
+    Sales totals and the daily series for the window ``start``..``end``
+    (inclusive), read from the SellerDailySales rollup. Without dates the
+    window is the last ``days`` days up to today.
+    """
     user = request.auth
-    if user.role in ["farmer", "supplier"]:
-        # Sales count
-        sales = Order.objects.filter(product__seller=user).count()
-
-        # Total revenue
-        revenue = Order.objects.filter(product__seller=user).aggregate(
-            total=Sum("total_price")
-        )["total"] or 0
-
-        # Recent sales trends (last 7 days)
-        recent_sales = (
-            Order.objects.filter(product__seller=user, created_at__gte=datetime.now() - timedelta(days=7))
-            .values("created_at__date")
-            .annotate(daily_sales=Count("id"), daily_revenue=Sum("total_price"))
-            .order_by("created_at__date")
+    if user.role not in ["farmer", "supplier"]:
+        return {"error": "Analytics not available for this role"}
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=max(days, 1) - 1)
+    if start > end:
+        return {"error": "start must not be after end"}
+
+    recent_sales = list(
+        SellerDailySales.objects.filter(seller=user, date__range=(start, end))
+        .order_by("date")
+        .values(
+            created_at__date=F("date"),
+            daily_sales=F("orders_count"),
+            daily_revenue=F("revenue"),
+            completed=F("completed_count"),
+            cancelled=F("cancelled_count"),
         )
+    )
+    return {
+        "start": start,
+        "end": end,
+        "sales_count": sum(day["daily_sales"] for day in recent_sales),
+        "total_revenue": sum((day["daily_revenue"] for day in recent_sales), Decimal("0")),
+        "recent_sales": recent_sales,
+    }
+
+
+
+def active_offers(offer_type=None, min_price=None, max_price=None, category=None):
+    # Expired offers are deactivated by the expiry sweeper (products.expiry),
+    # so is_active alone selects live offers through the partial indexes.
+    offers = Offer.objects.filter(is_active=True)
+
+    # Apply filters
+    if offer_type:
+        offers = offers.filter(offer_type=normalize_offer_type(offer_type))
+    if min_price is not None:
+        offers = offers.filter(price_per_unit__gte=min_price)
+    if max_price is not None:
+        offers = offers.filter(price_per_unit__lte=max_price)
+    if category:
+        offers = offers.filter(product__category__in=categories_named(category))
+    return offers
+
+
+def _latest(*timestamps):
+    return max((timestamp for timestamp in timestamps if timestamp), default=None)
+
+
+# Versions used for ETag/Last-Modified. They are cached under the same
+# namespaces as the responses, so a revalidation hit does not query either.
+# Lists send no Last-Modified: an offer that sells out, expires or is
+# deleted (or a deleted category) leaves the rows the newest timestamp is
+# taken from, so it would not move. The row count in the ETag does.
+@cached_response("offers", timeout=OFFER_LIST_TIMEOUT)
+def offer_list_version(request, offer_type=None, min_price=None, max_price=None, category=None, **kwargs):
+    version = active_offers(offer_type, min_price, max_price, category).aggregate(
+        count=Count("id"),
+        offers=Max("updated_at"),
+        products=Max("product__updated_at"),
+        categories=Max("product__category__updated_at"),
+    )
+    return (version["count"], _latest(version["offers"], version["products"], version["categories"])), None
 
-        return {
-            "sales_count": sales,
-            "total_revenue": revenue,
-            "recent_sales": list(recent_sales),
-        }
-    return {"error": "Analytics not available for this role"}
+
+@cached_response("offer_detail", "offer:{id}", timeout=OFFER_DETAIL_TIMEOUT)
+def offer_version(request, id):
+    version = (
+        Offer.objects.filter(id=id, is_active=True)
+        .values_list("updated_at", "product__updated_at", "product__category__updated_at")
+        .first()
+    )
+    if version is None:
+        return None
+    last_modified = _latest(*version)
+    return version, last_modified
 
 
+@cached_response("categories", timeout=CATEGORY_TIMEOUT)
+def category_list_version(request):
+    version = Category.objects.aggregate(count=Count("id"), updated=Max("updated_at"))
+    return (version["count"], version["updated"]), None
+
+
+@cached_response("category_stats", timeout=CATEGORY_TIMEOUT)
+def category_stats_version(request, **filters):
+    # Every refresh rewrites all rows with one computed_at, so the newest one versions the whole table.
+    computed = CategoryPriceStats.objects.order_by("-computed_at").values_list("computed_at", flat=True).first()
+    return computed, computed
+
 
 @public_offers.get("/offers/")
+@conditional(offer_list_version)
+@cached_response("offers", timeout=OFFER_LIST_TIMEOUT)
 def list_offers(
     request,
     offer_type: Optional[str] = None,
@@ -105,91 +241,75 @@ def list_offers(
     category: Optional[str] = None,  # New filter for category
     limit: int = 10,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    ordering: str = "newest",
+    with_total: Optional[bool] = None,
 ):
-    offers = Offer.objects.filter(is_active=True, expires_at__gte=datetime.now())
+    offers = active_offers(offer_type, min_price, max_price, category)
 
-    # Apply filters
-    if offer_type:
-        offers = offers.filter(offer_type__iexact=offer_type)
-    if min_price is not None:
-        offers = offers.filter(price_per_unit__gte=min_price)
-    if max_price is not None:
-        offers = offers.filter(price_per_unit__lte=max_price)
-    if category:
-        offers = offers.filter(product__category__name__iexact=category)
-
-    total_count = offers.count()
-    offers = offers[offset:offset + limit]
-
-    # Construct image URLs and include them in the response
-    host = request.build_absolute_uri('/')[:-1]  # Base URL without trailing slash
-    offer_list = []
-    for offer in offers:
-        offer_data = {
-            "id": offer.id,
-            "product__name": offer.product.name,
-            "price_per_unit": offer.price_per_unit,
-            "quantity": offer.quantity,
-            "offer_type": offer.offer_type,
-            "expires_at": offer.expires_at,
-            "product__category__name": offer.product.category.name,
-            "product__image": f"{host}{offer.product.image.url}" if offer.product.image else None,
-        }
-        offer_list.append(offer_data)
+    try:
+        rows, next_cursor, total_count = paginate(
+            offers, OFFER_ORDERINGS, ordering, cursor, limit, offset, with_total, values=OFFER_LIST.fields
+        )
+    except InvalidCursor as e:
+        return {"error": str(e)}
 
     return {
         "total_count": total_count,
-        "offers": offer_list,
+        "next_cursor": next_cursor,
+        "offers": OFFER_LIST.serialize(rows, request),
     }
 
 
 
 @public_offers.get("/offers/{id}/")
+@conditional(offer_version)
+@cached_response("offer_detail", "offer:{id}", timeout=OFFER_DETAIL_TIMEOUT)
 def get_offer(request, id: int):
     """
     Get details of a single offer by ID.
     """
-    offer = get_object_or_404(
-        Offer.objects.select_related("product__category"),
-        id=id,
-        is_active=True,
-        expires_at__gte=datetime.now()
+    rows = list(
+        Offer.objects.filter(id=id, is_active=True).values(*OFFER_DETAIL.fields)[:1]
     )
+    if not rows:
+        raise Http404("No Offer matches the given query.")
 
-    return {
-        "id": offer.id,
-        "product__name": offer.product.name,
-        "price_per_unit": offer.price_per_unit,
-        "quantity": offer.quantity,
-        "category": offer.product.category.name,
-        "expires_at": offer.expires_at,
-        "image_url": request.build_absolute_uri(offer.product.image.url)
-        if offer.product.image
-        else None,
-    }
+    return OFFER_DETAIL.serialize(rows, request)[0]
 
 
 # Authenticated user's "My Offers" endpoint
-@router.get("/my/offers/")
-def my_offers(request, limit: int = 10, offset: int = 0):
+@router.get("/my/offers/", auth=CachedJWTAuth())
+def my_offers(
+    request,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    ordering: str = "newest",
+    with_total: Optional[bool] = None,
+):
     user = request.auth
     offers = Offer.objects.filter(created_by=user)
 
-    total_count = offers.count()
-    offers = offers[offset:offset + limit]
+    try:
+        rows, next_cursor, total_count = paginate(
+            offers, OFFER_ORDERINGS, ordering, cursor, limit, offset, with_total,
+            values=MY_OFFERS.fields,
+        )
+    except InvalidCursor as e:
+        return {"error": str(e)}
 
     return {
         "total_count": total_count,
-        "offers": list(offers.values(
-            "id", "product__name", "price_per_unit", "quantity", "offer_type", "expires_at", "is_active"
-        ))
+        "next_cursor": next_cursor,
+        "offers": MY_OFFERS.serialize(rows, request),
     }
 
 
 
 
 # Create an offer
-@router.post("/offer/create/")
+@router.post("/offer/create/", auth=CachedJWTAuth())
 def create_offer(request, data: OfferCreateSchema):
     product = Product.objects.get(id=data.product_id)
 
@@ -209,7 +329,7 @@ def create_offer(request, data: OfferCreateSchema):
         min_order=data.min_order,
         max_order=data.max_order,
         created_by=request.auth,
-        expires_at=datetime.now() + timedelta(days=data.validity_days),
+        expires_at=timezone.now() + timedelta(days=data.validity_days),
     )
 
     # Deduct stock for sell offers
@@ -230,29 +350,39 @@ def search_offers(
     max_price: Optional[float] = None,
     limit: int = 10,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    ordering: Optional[str] = None,
+    with_total: Optional[bool] = None,
 ):
     offers = Offer.objects.filter(is_active=True)
+    orderings = OFFER_ORDERINGS
 
     # Apply filters
     if query:
-        offers = offers.filter(
-            Q(product__name__icontains=query) | Q(product__description__icontains=query)
-        )
+        # Ranked full-text match on product name, description, category and tags
+        offers = get_search_backend().filter(offers, query)
+        orderings = SEARCH_ORDERINGS
+    if ordering is None:
+        ordering = "relevance" if query else "newest"
     if offer_type:
-        offers = offers.filter(offer_type__iexact=offer_type)
+        offers = offers.filter(offer_type=normalize_offer_type(offer_type))
     if min_price is not None:
         offers = offers.filter(price_per_unit__gte=min_price)
     if max_price is not None:
         offers = offers.filter(price_per_unit__lte=max_price)
 
-    total_count = offers.count()
-    offers = offers[offset:offset + limit]
+    try:
+        rows, next_cursor, total_count = paginate(
+            offers, orderings, ordering, cursor, limit, offset, with_total,
+            values=OFFER_SEARCH.fields,
+        )
+    except InvalidCursor as e:
+        return {"error": str(e)}
 
     return {
         "total_count": total_count,
-        "offers": list(offers.values(
-            "id", "product__name", "price_per_unit", "quantity", "offer_type", "expires_at"
-        ))
+        "next_cursor": next_cursor,
+        "offers": OFFER_SEARCH.serialize(rows, request),
     }
 
 
@@ -260,10 +390,41 @@ def search_offers(
 
 # Get all categories
 @public_offers.get("/categories/", response=List[CategorySchema])
+@conditional(category_list_version)
+@cached_response("categories", timeout=CATEGORY_TIMEOUT)
 def list_categories(request):
     """List all categories."""
     categories = Category.objects.all()
-    return categories 
+    return list(categories.values("id", "name"))
+
+
+# Market prices per category, precomputed by products.price_stats
+@public_offers.get("/categories/stats/")
+@conditional(category_stats_version)
+@cached_response("category_stats", timeout=CATEGORY_TIMEOUT)
+def category_price_stats(request, category: Optional[str] = None, offer_type: Optional[str] = None):
+    """Min, max, mean, median, p10 and p90 of active offer prices by category and offer type."""
+    stats = CategoryPriceStats.objects.all()
+    if category:
+        stats = stats.filter(category__in=categories_named(category))
+    if offer_type:
+        stats = stats.filter(offer_type=normalize_offer_type(offer_type))
+    return {
+        "stats": list(
+            stats.order_by("category__name", "offer_type").values(
+                "category_id", "category__name", "offer_type", "offer_count", "min_price", "max_price",
+                "mean_price", "median_price", "p10_price", "p90_price", "computed_at",
+            )
+        )
+    }
+
+# Hit/miss counters for the public response cache
+@router.get("/cache/stats/", auth=CachedJWTAuth())
+def cache_stats(request):
+    """Per-endpoint cache hit/miss counters for this process. Staff only."""
+    if not request.auth.is_staff:
+        return {"error": "Only staff can view cache statistics"}
+    return stats.snapshot()
 
 # Create a category
 @router.post("/categories/", response=CategorySchema)
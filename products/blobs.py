@@ -0,0 +1,50 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import MediaBlob
+from .storage import BLOB_PREFIX
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(f"{BLOB_PREFIX}/")
+
+
+def acquire(name, storage):
+    """Count one more reference to the blob ``name``."""
+    if not is_blob(name):
+        return
+    if MediaBlob.objects.filter(name=name).update(ref_count=F("ref_count") + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, size=storage.size(name), ref_count=1)
+    except IntegrityError:
+        MediaBlob.objects.filter(name=name).update(ref_count=F("ref_count") + 1)
+
+
+def release(name, storage, variants=None):
+    """
+    Drop one reference to the blob ``name``. When none are left, the blob and
+    the image variants derived from it are deleted after the transaction
+    commits, unless the blob has been acquired again by then. Files stored
+    before content addressing are never deleted.
+    """
+    if not is_blob(name):
+        return
+    MediaBlob.objects.filter(name=name).update(ref_count=F("ref_count") - 1)
+    if MediaBlob.objects.filter(name=name, ref_count__lte=0).delete()[0]:
+        orphans = [name] + [
+            variant for key, variant in (variants or {}).items() if key != "source" and is_blob(variant)
+        ]
+        transaction.on_commit(lambda: _delete_unreferenced(name, orphans, storage))
+
+
+def _delete_unreferenced(name, orphans, storage):
+    # An upload of the same bytes may have reused the file and acquired the
+    # blob again since it was released. Lock the row, if there is one, while
+    # the files go, so that cannot happen halfway through.
+    with transaction.atomic():
+        if MediaBlob.objects.select_for_update().filter(name=name).exists():
+            return
+        for orphan in orphans:
+            storage.delete(orphan)
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+CACHE_ALIAS = "public_offers"
+
+OFFER_LIST_TIMEOUT = 60
+OFFER_DETAIL_TIMEOUT = 300
+CATEGORY_TIMEOUT = 3600
+
+
+class CacheStats:
+    """Per-process hit/miss counters for each cached endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, name, hit):
+        with self._lock:
+            counts = self._counts.setdefault(name, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {**counts, "hit_rate": counts["hits"] / ((counts["hits"] + counts["misses"]) or 1)}
+                for name, counts in self._counts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _generation_key(namespace):
+    return f"generation:{namespace}"
+
+
+def get_generations(namespaces):
+    """
+    Current generation of each namespace. A response is cached under the
+    generations it was built from, so bumping one orphans every entry that
+    depends on it without having to find and delete those entries.
+    """
+    cache = get_cache()
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        if key not in found:
+            # Seed from the clock so an evicted counter never restarts at an
+            # old value and revives stale entries.
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        generations.append(found[key])
+    return generations
+
+
+def bump(*namespaces):
+    cache = get_cache()
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate(*namespaces):
+    # Readers must not see the new generation before the data is committed,
+    # or they could cache the old rows under it.
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+def _response_key(name, generations, request, kwargs):
+    params = sorted((key, value) for key, values in request.GET.lists() for value in values if value != "")
+    raw = repr((name, generations, request.build_absolute_uri("/"), sorted(kwargs.items()), params))
+    return f"response:{name}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def cached_response(*namespaces, timeout=OFFER_LIST_TIMEOUT):
+    """
+    Cache the data returned by a view, keyed on its path arguments and the
+    normalized query string. ``namespaces`` may reference path arguments,
+    e.g. ``"offer:{id}"``. Error payloads are never cached.
+    """
+
+    def decorator(view):
+        name = view.__name__
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            cache = get_cache()
+            generations = get_generations([namespace.format(**kwargs) for namespace in namespaces])
+            key = _response_key(name, generations, request, kwargs)
+
+            response = cache.get(key)
+            stats.record(name, hit=response is not None)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if not (isinstance(response, dict) and "error" in response):
+                cache.set(key, response, timeout)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,52 @@
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from ninja.responses import NinjaJSONEncoder
+
+
+def make_etag(request, version):
+    params = sorted((key, value) for key, values in request.GET.lists() for value in values if value != "")
+    raw = repr((request.build_absolute_uri(request.path), params, version))
+    return f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def conditional(version):
+    """
+    Add a strong ``ETag`` and ``Last-Modified`` to a view and answer
+    ``If-None-Match`` / ``If-Modified-Since`` with 304 before the view runs.
+
+    ``version(request, **kwargs)`` returns ``(token, last_modified)`` for the
+    rows the view would return, or ``None`` to skip the check (e.g. missing
+    rows, so the view can raise its own 404). ``last_modified`` may be None
+    to send the ETag alone. The ETag is the token combined
+    with the URL and normalized query string.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            current = version(request, **kwargs)
+            if current is None:
+                return view(request, *args, **kwargs)
+            token, last_modified = current
+            etag = make_etag(request, token)
+            # HTTP dates have one-second resolution.
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                data = view(request, *args, **kwargs)
+                if isinstance(data, HttpResponse) or (isinstance(data, dict) and "error" in data):
+                    return data
+                response = JsonResponse(data, encoder=NinjaJSONEncoder, safe=False)
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,76 @@
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate
+from .models import Offer, Product
+from users.dashboard import invalidate_dashboards
+
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = 500
+
+
+@dataclass
+class SweepResult:
+    offers: int = 0
+    released: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+def sweep_expired_offers(batch_size=SWEEP_BATCH_SIZE, now=None):
+    """
+    Deactivate active offers whose ``expires_at`` has passed, in batches of
+    ``batch_size``, and return the unsold quantity of Sell offers to
+    ``Product.stock``. Each batch is its own short transaction so writers
+    are never blocked for long.
+    """
+    now = now or timezone.now()
+    result = SweepResult()
+    started = time.perf_counter()
+
+    while True:
+        with transaction.atomic():
+            # Served by the partial index on (expires_at) WHERE is_active.
+            expired = list(
+                Offer.objects.select_for_update()
+                .filter(is_active=True, expires_at__lt=now)
+                .values_list("id", "product_id", "offer_type", "quantity", "created_by_id")[:batch_size]
+            )
+            if not expired:
+                break
+
+            # The unsold quantity moves to the product, so the offer keeps none.
+            Offer.objects.filter(id__in=[row[0] for row in expired]).update(
+                is_active=False, quantity=0, updated_at=now,
+            )
+
+            released = defaultdict(int)
+            for _, product_id, offer_type, quantity, _ in expired:
+                if offer_type == "Sell" and quantity:
+                    released[product_id] += quantity
+            for product_id, quantity in released.items():
+                Product.objects.filter(id=product_id).update(stock=F("stock") + quantity, updated_at=now)
+            invalidate_dashboards(*{row[4] for row in expired})
+
+        result.offers += len(expired)
+        result.released += sum(released.values())
+        result.batches += 1
+
+    if result.offers:
+        # Bulk updates skip the model signals that normally do this.
+        invalidate("offers", "offer_detail")
+
+    result.seconds = time.perf_counter() - started
+    logger.info(
+        "Expired %d offers in %d batches, released %d units to stock in %.3fs",
+        result.offers, result.batches, result.released, result.seconds,
+    )
+    return result
@@ -0,0 +1,90 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import invalidate
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# name: (longest side in pixels, Pillow format, file extension, save options)
+VARIANTS = {
+    "thumb": (320, "JPEG", "jpg", {"quality": 80, "optimize": True, "progressive": True}),
+    "thumb_webp": (320, "WEBP", "webp", {"quality": 75, "method": 4}),
+    "medium": (1024, "JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "medium_webp": (1024, "WEBP", "webp", {"quality": 78, "method": 4}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, "IMAGE_VARIANT_WORKERS", 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-variants")
+    return _executor
+
+
+def variant_name(source, variant):
+    stem = posixpath.splitext(posixpath.basename(source))[0]
+    extension = VARIANTS[variant][2]
+    return posixpath.join(posixpath.dirname(source), "variants", f"{stem}_{variant}.{extension}")
+
+
+def needs_variants(product):
+    return bool(product.image) and product.image_variants.get("source") != product.image.name
+
+
+def generate_variants(product_id):
+    """
+    Write every variant of the product's current image and record them on
+    the product. Returns the variant map, or None if there was nothing to do.
+    """
+    product = Product.objects.filter(id=product_id).only("id", "image").first()
+    if product is None or not product.image:
+        return None
+    source = product.image.name
+    storage = product.image.storage
+
+    with storage.open(source, "rb") as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original = original.convert("RGB") if original.mode not in ("RGB", "L") else original
+
+    variants = {"source": source}
+    for variant, (size, image_format, _, options) in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+        # Stored by content, so identical variants are written only once and
+        # an older copy under the same digest is never overwritten.
+        variants[variant] = storage.save(variant_name(source, variant), ContentFile(buffer.getvalue()))
+
+    # Skip the write if the image was replaced while we were working. The
+    # queryset update skips auto_now, so set updated_at for the ETags.
+    if Product.objects.filter(id=product_id, image=source).update(image_variants=variants, updated_at=timezone.now()):
+        invalidate("offers", "offer_detail")
+    return variants
+
+
+def _run(product_id):
+    try:
+        generate_variants(product_id)
+    except Exception:
+        logger.exception("Failed to generate image variants for product %s", product_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(product):
+    """Generate variants in the worker pool once the current transaction commits."""
+    transaction.on_commit(lambda: get_executor().submit(_run, product.pk))
@@ -0,0 +1,88 @@
+from decimal import Decimal
+from typing import Optional
+
+from django.db import transaction
+from django.db.models.functions import Lower
+from pydantic import BaseModel, Field, ValidationError
+
+from stebofarm_project.imports import ImportReport
+from users.dashboard import invalidate_dashboards
+
+from .models import Category, Product, ProductTag
+from .search import get_search_backend
+from .tags import get_or_create_tags, parse_tags
+
+
+IMPORT_BATCH_SIZE = 500
+
+
+class ProductImportSchema(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    description: str = ""
+    category: str = Field(..., min_length=1, description="Category name")
+    price: Decimal = Field(..., ge=0, max_digits=10, decimal_places=2)
+    stock: int = Field(..., ge=0)
+    tags: Optional[str] = Field(None, max_length=255)
+
+
+def import_products(rows, seller, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Validate ``rows`` (dicts, e.g. from stebofarm_project.imports.iter_csv)
+    one at a time and insert the valid ones for ``seller`` with
+    ``bulk_create`` every ``batch_size`` rows. Only the current batch is held
+    in memory. Returns an ImportReport with per-row errors, numbered from 1.
+    """
+    categories = dict(Category.objects.annotate(key=Lower("name")).values_list("key", "id"))
+    report = ImportReport()
+    batch = []
+
+    for number, row in enumerate(rows, start=1):
+        report.rows += 1
+        if isinstance(row, Exception):
+            report.add_error(number, f"Invalid row: {row}")
+            continue
+        try:
+            data = ProductImportSchema.model_validate(row)
+        except ValidationError as e:
+            report.add_error(number, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        category_id = categories.get(data.category.strip().lower())
+        if category_id is None:
+            report.add_error(number, f"Unknown category '{data.category}'")
+            continue
+
+        batch.append(Product(
+            seller=seller,
+            name=data.name,
+            description=data.description,
+            category_id=category_id,
+            price=data.price,
+            stock=data.stock,
+            tags=data.tags,
+        ))
+        if len(batch) >= batch_size:
+            report.created += _insert(batch)
+            batch = []
+
+    if batch:
+        report.created += _insert(batch)
+    return report
+
+
+def _insert(products):
+    with transaction.atomic():
+        products = Product.objects.bulk_create(products)
+        # bulk_create skips post_save, so do the tag, search index and
+        # dashboard upkeep here.
+        tag_ids = get_or_create_tags(sorted({name for product in products for name in parse_tags(product.tags)}))
+        ProductTag.objects.bulk_create(
+            [
+                ProductTag(product_id=product.id, tag_id=tag_ids[name])
+                for product in products
+                for name in parse_tags(product.tags)
+            ],
+            ignore_conflicts=True,
+        )
+        get_search_backend().index([product.id for product in products])
+        invalidate_dashboards(*{product.seller_id for product in products})
+    return len(products)
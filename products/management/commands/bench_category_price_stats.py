@@ -0,0 +1,80 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min
+from django.utils import timezone
+
+from products.models import Category, CategoryPriceStats, Offer, Product
+from products.price_stats import refresh_category_price_stats
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time the category price statistics job on a synthetic set of active offers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offers", type=int, default=1_000_000)
+        parser.add_argument("--categories", type=int, default=50)
+
+    def handle(self, *args, **options):
+        # Everything is created inside a transaction that is rolled back at the end.
+        try:
+            with transaction.atomic():
+                self.run(options["offers"], options["categories"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, count, category_count):
+        rng = random.Random(42)
+        seller = User.objects.create_user(username="bench-stats-seller", password=None, role="farmer")
+        categories = [Category.objects.create(name=f"bench-stats-{i}") for i in range(category_count)]
+        products = Product.objects.bulk_create(
+            [
+                Product(name=f"Product {i}", description="", category=rng.choice(categories), price=1, stock=10,
+                        seller=seller)
+                for i in range(max(count // 100, 1))
+            ],
+            batch_size=5000,
+        )
+        expires_at = timezone.now() + timedelta(days=7)
+
+        started = time.perf_counter()
+        for start in range(0, count, 50_000):
+            Offer.objects.bulk_create(
+                [
+                    Offer(product=rng.choice(products), offer_type=rng.choice(("Buy", "Sell")),
+                          price_per_unit=round(rng.lognormvariate(3, 1), 2), quantity=10, min_order=1,
+                          max_order=10, created_by=seller, expires_at=expires_at)
+                    for _ in range(min(50_000, count - start))
+                ],
+                batch_size=5000,
+            )
+        self.stdout.write(f"Created {count} offers in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        list(
+            Offer.objects.filter(is_active=True)
+            .values("product__category_id", "offer_type")
+            .annotate(count=Count("id"), low=Min("price_per_unit"), high=Max("price_per_unit"), mean=Avg("price_per_unit"))
+        )
+        self.stdout.write(
+            f"SQL GROUP BY (min/max/mean only, no percentiles): {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+        result = refresh_category_price_stats()
+        self.stdout.write(
+            f"Stats job for {result.offers} offers, {result.groups} groups: fetch {result.fetch_seconds * 1000:.0f} ms, "
+            f"compute {result.compute_seconds * 1000:.0f} ms, write {result.write_seconds * 1000:.0f} ms"
+        )
+
+        started = time.perf_counter()
+        list(CategoryPriceStats.objects.values())
+        self.stdout.write(f"Read of the stats table: {(time.perf_counter() - started) * 1000:.2f} ms")
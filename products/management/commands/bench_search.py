@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from products.models import Category, Offer, Product
+from products.search import IContainsBackend, SQLiteFTSBackend
+from users.models import User
+
+
+WORDS = [
+    "maize", "beans", "rice", "cassava", "sorghum", "millet", "tomato", "onion", "cabbage", "banana",
+    "mango", "avocado", "coffee", "tea", "cashew", "sunflower", "goat", "cattle", "chicken", "fertilizer",
+    "seed", "hoe", "sprayer", "irrigation", "organic", "fresh", "dried", "bulk", "premium", "local",
+]
+QUERIES = ["maize", "mai", "fresh tomato", "organic coffee", "spray", "cattle bulk"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare the full-text search index with the legacy icontains search on a synthetic catalogue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Everything is created inside a transaction that is rolled back at the end.
+        try:
+            with transaction.atomic():
+                self.run(options["products"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, count, repeat):
+        rng = random.Random(42)
+        # Pad the vocabulary so each query term is selective, as in a real catalogue.
+        vocabulary = WORDS + ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=7)) for _ in range(3000)]
+        seller = User.objects.create_user(username="bench-search-seller", password=None, role="farmer")
+        categories = [Category.objects.create(name=f"bench-{name}") for name in ("Crop", "Livestock", "Tool")]
+        expires_at = timezone.now() + timedelta(days=7)
+
+        started = time.perf_counter()
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=" ".join(rng.sample(vocabulary, 3)),
+                    description=" ".join(rng.choices(vocabulary, k=30)),
+                    category=rng.choice(categories),
+                    price=1,
+                    stock=10,
+                    seller=seller,
+                    tags=",".join(rng.sample(vocabulary, 3)),
+                )
+                for _ in range(count)
+            ],
+            batch_size=5000,
+        )
+        Offer.objects.bulk_create(
+            [
+                Offer(product=product, offer_type="Sell", price_per_unit=rng.randint(1, 1000), quantity=10,
+                      min_order=1, max_order=10, created_by=seller, expires_at=expires_at)
+                for product in products
+            ],
+            batch_size=5000,
+        )
+        self.stdout.write(f"Created {count} products and offers in {time.perf_counter() - started:.1f}s")
+
+        fts = SQLiteFTSBackend()
+        started = time.perf_counter()
+        fts.rebuild()
+        self.stdout.write(f"Rebuilt the search index in {time.perf_counter() - started:.1f}s")
+
+        active = Offer.objects.filter(is_active=True)
+        paths = {
+            "legacy icontains": lambda q: active.filter(
+                Q(product__name__icontains=q) | Q(product__description__icontains=q)
+            ).order_by("-created_at", "-id"),
+            "icontains backend": lambda q: IContainsBackend().filter(active, q).order_by("-created_at", "-id"),
+            "fts5 bm25": lambda q: fts.filter(active, q).order_by("rank", "id"),
+        }
+        for query in QUERIES:
+            self.stdout.write(f"\nquery={query!r}")
+            for name, search in paths.items():
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    # What the endpoint does for a first page: the page plus the exact count.
+                    results = search(query)
+                    list(results.values("id")[:20])
+                    results.count()
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(f"  {name:<18} median {statistics.median(timings):8.2f} ms  max {max(timings):8.2f} ms")
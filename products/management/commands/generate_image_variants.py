@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products.images import generate_variants, needs_variants
+from products.models import Product
+
+
+def _generate(product_id):
+    try:
+        return product_id, generate_variants(product_id) is not None, None
+    except Exception as e:
+        return product_id, False, str(e)
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail, medium and WebP variants for existing product images in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--force", action="store_true", help="Regenerate variants that already exist.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image="").exclude(image__isnull=True).only("id", "image", "image_variants")
+        product_ids = [
+            product.id for product in products.iterator(chunk_size=2000)
+            if options["force"] or needs_variants(product)
+        ]
+        self.stdout.write(f"Generating variants for {len(product_ids)} products with {options['workers']} workers")
+
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+        started = time.perf_counter()
+        generated = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=connections.close_all) as pool:
+            for product_id, done, error in pool.map(_generate, product_ids, chunksize=8):
+                generated += done
+                if error:
+                    failed += 1
+                    self.stderr.write(f"product {product_id}: {error}")
+
+        self.stdout.write(
+            f"Done: {generated} generated, {failed} failed, {len(product_ids) - generated - failed} skipped "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
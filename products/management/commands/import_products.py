@@ -0,0 +1,40 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import IMPORT_BATCH_SIZE, import_products
+from stebofarm_project.imports import READERS
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Import products from a CSV or JSON Lines file for one seller."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--seller", required=True, help="Username of the seller.")
+        parser.add_argument("--format", choices=sorted(READERS), help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        format = options["format"] or path.suffix.lstrip(".").lower()
+        if format not in READERS:
+            raise CommandError("Unsupported format, use --format csv or --format jsonl")
+        try:
+            seller = User.objects.get(username=options["seller"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown seller '{options['seller']}'")
+
+        started = time.perf_counter()
+        with path.open("rb") as stream:
+            report = import_products(READERS[format](stream), seller, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(
+            f"Read {report.rows} rows, created {report.created} products, {report.error_count} errors "
+            f"in {elapsed:.2f}s ({report.rows / elapsed if elapsed else 0:,.0f} rows/s)"
+        )
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.price_stats import refresh_category_price_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute per-category price statistics of active offers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep running and refresh every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = refresh_category_price_stats()
+            self.stdout.write(
+                f"Computed {result.groups} category stats from {result.offers} offers: "
+                f"fetch {result.fetch_seconds * 1000:.0f} ms, compute {result.compute_seconds * 1000:.0f} ms, "
+                f"write {result.write_seconds * 1000:.0f} ms"
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
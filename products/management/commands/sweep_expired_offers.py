@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.expiry import SWEEP_BATCH_SIZE, sweep_expired_offers
+
+
+class Command(BaseCommand):
+    help = "Deactivate expired offers and release unsold Sell quantity back to product stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep running and sweep every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = sweep_expired_offers(batch_size=options["batch_size"])
+            self.stdout.write(
+                f"Expired {result.offers} offers in {result.batches} batches, "
+                f"released {result.released} units to stock in {result.seconds * 1000:.1f} ms"
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+BATCH_SIZE = 1000
+
+
+def parse_tags(value):
+    names = []
+    for name in (value or "").split(","):
+        name = name.strip().lower()[:50]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def backfill_product_tags(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Tag = apps.get_model("products", "Tag")
+    ProductTag = apps.get_model("products", "ProductTag")
+
+    products = Product.objects.exclude(tags__isnull=True).exclude(tags="").values_list("id", "tags")
+    batch = []
+    for row in products.iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            _backfill(Tag, ProductTag, batch)
+            batch = []
+    if batch:
+        _backfill(Tag, ProductTag, batch)
+
+
+def _backfill(Tag, ProductTag, rows):
+    parsed = [(product_id, parse_tags(tags)) for product_id, tags in rows]
+    names = {name for _, product_names in parsed for name in product_names}
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    ProductTag.objects.bulk_create(
+        [
+            ProductTag(product_id=product_id, tag_id=tag_ids[name])
+            for product_id, product_names in parsed
+            for name in product_names
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_tag_producttag'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryPriceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offer_type', models.CharField(choices=[('Buy', 'Buy'), ('Sell', 'Sell')], max_length=10)),
+                ('offer_count', models.PositiveIntegerField()),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mean_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('median_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('p10_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('p90_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('computed_at', models.DateTimeField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_stats', to='products.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['computed_at'], name='category_stats_computed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'offer_type'), name='unique_category_price_stats')],
+            },
+        ),
+    ]
@@ -1,10 +1,19 @@
 from django.db import models
+from django.db.models.functions import Lower
 from users.models import User
+from .storage import get_image_storage
 
 
 class Category(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Case-insensitive lookups by name (see products.api.categories_named)
+            models.Index(Lower("name"), name="category_name_lower_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -22,16 +31,60 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="products")
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
-    image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image = models.ImageField(upload_to='products/', storage=get_image_storage, blank=True, null=True)
+    # Resized copies of ``image`` written by products.images, keyed by variant
+    # name, plus the "source" image they were generated from.
+    image_variants = models.JSONField(default=dict, blank=True)
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name="products")
     tags = models.CharField(max_length=255, blank=True, null=True)  # Comma-separated tags
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset orderings used by list_products
+            models.Index(fields=["created_at", "id"], name="product_created_idx"),
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
 
 
+class MediaBlob(models.Model):
+    # Reference count for a content-addressed file (see products.storage).
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+
+class ProductTag(models.Model):
+    # Normalized copy of Product.tags, maintained on save (see products.tags).
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="product_tags")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="product_tags")
+
+    class Meta:
+        constraints = [
+            # Leads with tag so "products having tag X" is an index range scan.
+            models.UniqueConstraint(fields=["tag", "product"], name="unique_product_tag"),
+        ]
+
+
+
 class Offer(models.Model):
     OFFER_TYPE_CHOICES = [
         ('Buy', 'Buy'),
@@ -45,9 +98,25 @@ class Offer(models.Model):
     max_order = models.PositiveIntegerField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="offers")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     expires_at = models.DateTimeField()
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # Public reads only ever look at active offers, so most indexes are
+        # partial on is_active and stay small as inactive offers pile up.
+        indexes = [
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_active=True), name="offer_active_created_idx"),
+            models.Index(fields=["price_per_unit", "id"], condition=models.Q(is_active=True), name="offer_active_price_idx"),
+            models.Index(
+                fields=["offer_type", "price_per_unit", "id"],
+                condition=models.Q(is_active=True),
+                name="offer_active_type_price_idx",
+            ),
+            models.Index(fields=["expires_at"], condition=models.Q(is_active=True), name="offer_active_expires_idx"),
+            models.Index(fields=["created_by", "created_at", "id"], name="offer_creator_created_idx"),
+        ]
+
 
 
 class CounterOffer(models.Model):
@@ -56,4 +125,27 @@ class CounterOffer(models.Model):
     proposed_price = models.DecimalField(max_digits=10, decimal_places=2)
     proposed_quantity = models.PositiveIntegerField()
     status = models.CharField(max_length=20, choices=[('Pending', 'Pending'), ('Accepted', 'Accepted'), ('Rejected', 'Rejected')])
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class CategoryPriceStats(models.Model):
+    # Snapshot of active offer prices per category and offer type, rewritten
+    # periodically by products.price_stats.
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="price_stats")
+    offer_type = models.CharField(max_length=10, choices=Offer.OFFER_TYPE_CHOICES)
+    offer_count = models.PositiveIntegerField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    mean_price = models.DecimalField(max_digits=10, decimal_places=2)
+    median_price = models.DecimalField(max_digits=10, decimal_places=2)
+    p10_price = models.DecimalField(max_digits=10, decimal_places=2)
+    p90_price = models.DecimalField(max_digits=10, decimal_places=2)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["category", "offer_type"], name="unique_category_price_stats"),
+        ]
+        indexes = [
+            models.Index(fields=["computed_at"], name="category_stats_computed_idx"),
+        ]
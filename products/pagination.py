@@ -0,0 +1,125 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Orderings available to the listing endpoints. Each one ends with the primary
+# key so the sort is total and a page boundary can be expressed as a seek.
+OFFER_ORDERINGS = {
+    "newest": ("-created_at", "-id"),
+    "price": ("price_per_unit", "id"),
+}
+
+# Search results carry a ``rank`` annotation from the search backend.
+SEARCH_ORDERINGS = {
+    **OFFER_ORDERINGS,
+    "relevance": ("rank", "id"),
+}
+
+PRODUCT_ORDERINGS = {
+    "newest": ("-created_at", "-id"),
+    "price": ("price", "id"),
+}
+
+ORDER_ORDERINGS = {
+    "newest": ("-created_at", "-id"),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(ordering, values):
+    payload = json.dumps([ordering, [str(value) for value in values]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ordering, size=None):
+    """
+    The seek values in ``cursor``, checked to be ``size`` strings or numbers
+    (any number if ``size`` is None). Raises InvalidCursor otherwise.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if name != ordering:
+        raise InvalidCursor("Cursor does not match the requested ordering")
+    if (
+        not isinstance(values, list)
+        or (size is not None and len(values) != size)
+        or not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values)
+    ):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def _seek(fields, values):
+    # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), with the direction of each
+    # comparison taken from the ordering so an index on (a, b) can serve it.
+    condition = Q()
+    equal = {}
+    for field, value in zip(fields, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+def _row_value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def paginate(queryset, orderings, ordering="newest", cursor=None, limit=10, offset=0,
+             with_total=None, values=None):
+    """
+    Page through ``queryset`` either by ``offset`` (legacy clients) or by an
+    opaque ``cursor`` returned from the previous page.
+
+    Returns ``(rows, next_cursor, total_count)``. The exact count is only
+    computed when ``with_total`` is set; it defaults to on for offset paging
+    and off for cursor paging.
+    """
+    if ordering not in orderings:
+        raise InvalidCursor(f"Unknown ordering '{ordering}'")
+    fields = orderings[ordering]
+    names = [field.lstrip("-") for field in fields]
+
+    if with_total is None:
+        with_total = cursor is None
+    total_count = queryset.count() if with_total else None
+
+    queryset = queryset.order_by(*fields)
+    extra = []
+    if values is not None:
+        extra = [name for name in names if name not in values]
+        queryset = queryset.values(*values, *extra)
+
+    if cursor:
+        seek = decode_cursor(cursor, ordering, len(fields))
+        try:
+            queryset = queryset.filter(_seek(fields, seek))
+        except (ValidationError, TypeError, ValueError):
+            # A well-formed cursor can still hold values the fields reject.
+            raise InvalidCursor("Invalid cursor")
+        offset = 0
+
+    # Fetch one row past the page to learn whether another page exists.
+    rows = list(queryset[offset:offset + limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            next_cursor = encode_cursor(ordering, [_row_value(rows[-1], name) for name in names])
+    for row in rows:
+        for name in extra:
+            del row[name]
+
+    return rows, next_cursor, total_count
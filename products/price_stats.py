@@ -0,0 +1,106 @@
+import math
+import time
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate
+from .models import CategoryPriceStats, Offer
+
+
+FETCH_SIZE = 50_000
+
+CENT = Decimal("0.01")
+
+
+@dataclass
+class StatsResult:
+    offers: int = 0
+    groups: int = 0
+    fetch_seconds: float = 0.0
+    compute_seconds: float = 0.0
+    write_seconds: float = 0.0
+
+
+def fetch_prices():
+    """
+    Load the price of every active offer in one pass and return a sorted
+    array of prices per (category_id, offer_type). Rows are read straight
+    off the cursor, skipping the ORM's per-row Decimal conversion, and
+    sorted per group in memory, which beats an ORDER BY over the join.
+    """
+    queryset = (
+        Offer.objects.filter(is_active=True)
+        .order_by()
+        .values_list("product__category_id", "offer_type", "price_per_unit")
+    )
+    sql, params = queryset.query.sql_with_params()
+    groups = defaultdict(list)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(FETCH_SIZE):
+            for category_id, offer_type, price in rows:
+                groups[category_id, offer_type].append(price)
+    return {key: array("d", sorted(prices)) for key, prices in groups.items()}
+
+
+def percentile(prices, q):
+    """Linearly interpolated percentile of the sorted array ``prices``."""
+    position = q * (len(prices) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(prices) - 1)
+    return prices[lower] + (prices[upper] - prices[lower]) * (position - lower)
+
+
+def compute_stats(groups):
+    """Yield one statistics dict per (category_id, offer_type) group of sorted prices."""
+    for (category_id, offer_type), prices in groups.items():
+        yield {
+            "category_id": category_id,
+            "offer_type": offer_type,
+            "offer_count": len(prices),
+            "min_price": prices[0],
+            "max_price": prices[-1],
+            "mean_price": math.fsum(prices) / len(prices),
+            "median_price": percentile(prices, 0.5),
+            "p10_price": percentile(prices, 0.1),
+            "p90_price": percentile(prices, 0.9),
+        }
+
+
+def _money(value):
+    return Decimal(repr(value)).quantize(CENT)
+
+
+def refresh_category_price_stats():
+    """Recompute every category's price statistics and replace the stored snapshot."""
+    result = StatsResult()
+
+    started = time.perf_counter()
+    groups = fetch_prices()
+    result.offers = sum(len(prices) for prices in groups.values())
+    result.fetch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    stats = list(compute_stats(groups))
+    result.groups = len(stats)
+    result.compute_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    now = timezone.now()
+    with transaction.atomic():
+        CategoryPriceStats.objects.all().delete()
+        CategoryPriceStats.objects.bulk_create([
+            CategoryPriceStats(
+                computed_at=now,
+                **{name: _money(value) if name.endswith("_price") else value for name, value in row.items()},
+            )
+            for row in stats
+        ])
+    invalidate("category_stats")
+    result.write_seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,72 @@
+from .models import Product
+
+
+class OfferProjection:
+    """
+    Flat, single-query view of offers for the public endpoints.
+
+    ``fields`` are passed straight to ``QuerySet.values()`` so a page is one
+    SELECT with the product and category joined in. ``rename`` maps ORM paths
+    to the keys clients expect. ``product__image`` is turned into an absolute
+    URL of the ``image_variant`` size when it has been generated (see
+    products.images), falling back to the original upload, and a WebP
+    alternative is added as ``product__image_webp``.
+    """
+
+    def __init__(self, fields, rename=None, image_variant=None):
+        self.fields = tuple(fields)
+        self.rename = rename or {}
+        self.image_variant = image_variant
+        if "product__image" in self.fields:
+            self.fields += ("product__image_variants",)
+
+    def serialize(self, rows, request):
+        image_url = image_url_builder(request) if "product__image" in self.fields else None
+        result = []
+        for row in rows:
+            if image_url is not None:
+                variants = row.pop("product__image_variants") or {}
+                if variants.get("source") != row["product__image"]:
+                    variants = {}
+                row["product__image"] = image_url(variants.get(self.image_variant) or row["product__image"])
+                row["product__image_webp"] = image_url(variants.get(f"{self.image_variant}_webp"))
+            for source, target in self.rename.items():
+                row[target] = row.pop(source)
+            result.append(row)
+        return result
+
+
+def image_url_builder(request):
+    """Resolve the host and storage once per response instead of once per image."""
+    storage = Product._meta.get_field("image").storage
+    host = request.build_absolute_uri("/")[:-1]
+
+    def build(name):
+        return f"{host}{storage.url(name)}" if name else None
+
+    return build
+
+
+OFFER_SEARCH = OfferProjection(
+    ("id", "product__name", "price_per_unit", "quantity", "offer_type", "expires_at"),
+)
+
+# Listing cards get the thumbnail, the detail view the medium size.
+OFFER_LIST = OfferProjection(
+    OFFER_SEARCH.fields + ("product__category__name", "product__image"),
+    image_variant="thumb",
+)
+
+MY_OFFERS = OfferProjection(
+    OFFER_SEARCH.fields + ("is_active",),
+)
+
+OFFER_DETAIL = OfferProjection(
+    ("id", "product__name", "price_per_unit", "quantity", "product__category__name", "expires_at", "product__image"),
+    rename={
+        "product__category__name": "category",
+        "product__image": "image_url",
+        "product__image_webp": "image_url_webp",
+    },
+    image_variant="medium",
+)
@@ -0,0 +1,133 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+
+FTS_TABLE = "products_product_fts"
+
+# bm25() column weights, in table column order: name, description, category, tags.
+FTS_WEIGHTS = (10.0, 1.0, 2.0, 5.0)
+
+INDEX_BATCH_SIZE = 1000
+
+
+def search_terms(query):
+    return re.findall(r"\w+", (query or "").lower())
+
+
+class SearchBackend:
+    """
+    Interface for product search. ``filter`` narrows a queryset of products
+    (``product_field=""``) or of rows pointing at a product (offers) to the
+    matches for ``query`` and annotates each row with a ``rank`` where lower
+    is more relevant.
+    """
+
+    def filter(self, queryset, query, product_field="product"):
+        raise NotImplementedError
+
+    def index(self, product_ids):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class IContainsBackend(SearchBackend):
+    """Unindexed fallback for databases without a full-text engine."""
+
+    def filter(self, queryset, query, product_field="product"):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        prefix = f"{product_field}__" if product_field else ""
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(**{f"{prefix}name__icontains": term})
+                | Q(**{f"{prefix}description__icontains": term})
+                | Q(**{f"{prefix}category__name__icontains": term})
+                | Q(**{f"{prefix}tags__icontains": term})
+            )
+        return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    SQLite FTS5 index keyed by product id. Every term in the query is matched
+    as a prefix so partial words typed by the user still hit, and results
+    are ranked with BM25.
+    """
+
+    def match_expression(self, query):
+        return " ".join(f'"{term}"*' for term in search_terms(query))
+
+    def filter(self, queryset, query, product_field="product"):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        column = f"{product_field}_id" if product_field else "id"
+        outer = f'"{queryset.model._meta.db_table}"."{column}"'
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        # Join the index once so the MATCH drives the query and bm25() is
+        # evaluated in the same scan. The unary "+" stops SQLite from probing
+        # the index by rowid per outer row, which would redo the match each time.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"+{FTS_TABLE}.rowid = {outer}", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+        ).annotate(rank=RawSQL(f"bm25({FTS_TABLE}, {weights})", (), output_field=FloatField()))
+
+    def index(self, product_ids):
+        product_ids = list(product_ids)
+        for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+            batch = product_ids[start:start + INDEX_BATCH_SIZE]
+            rows = Product.objects.filter(id__in=batch).values_list(
+                "id", "name", "description", "category__name", "tags"
+            )
+            with connection.cursor() as cursor:
+                self._delete(cursor, batch)
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, name, description, category, tags) VALUES (%s, %s, %s, %s, %s)",
+                    list(rows),
+                )
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+                self._delete(cursor, product_ids[start:start + INDEX_BATCH_SIZE])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, category, tags) "
+                "SELECT p.id, p.name, p.description, c.name, p.tags "
+                "FROM products_product p JOIN products_category c ON c.id = p.category_id"
+            )
+
+    def _delete(self, cursor, product_ids):
+        if product_ids:
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, "PRODUCT_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == "sqlite":
+        return SQLiteFTSBackend()
+    return IContainsBackend()
@@ -0,0 +1,110 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs
+from .cache import invalidate
+from .images import needs_variants, schedule_variants
+from .models import Category, Offer, Product
+from .search import get_search_backend
+from .tags import sync_product_tags
+from users.dashboard import invalidate_dashboards
+
+
+# Keep the product search index in step with the catalogue.
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def sync_tags(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "tags" in update_fields:
+        sync_product_tags(instance)
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, **kwargs):
+    if needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+# Reference-count content-addressed product images (see products.blobs).
+def _image_name(value):
+    return getattr(value, "name", value) or None
+
+
+@receiver(post_init, sender=Product)
+def remember_image(sender, instance, **kwargs):
+    # Read the raw attribute so a deferred image field is not fetched here.
+    if "image" in instance.__dict__:
+        instance._loaded_image = _image_name(instance.__dict__["image"])
+    else:
+        instance._loaded_image = DEFERRED
+
+
+@receiver(pre_save, sender=Product)
+def load_replaced_image(sender, instance, **kwargs):
+    instance._replaced_variants = {}
+    if not instance.pk:
+        return
+    if instance._loaded_image is DEFERRED:
+        row = Product.objects.filter(pk=instance.pk).values("image").first()
+        instance._loaded_image = row["image"] or None if row else None
+    if blobs.is_blob(instance._loaded_image) and _image_name(instance.image) != instance._loaded_image:
+        row = Product.objects.filter(pk=instance.pk).values("image_variants").first()
+        instance._replaced_variants = row["image_variants"] if row else {}
+
+
+@receiver(post_save, sender=Product)
+def count_image_references(sender, instance, **kwargs):
+    name = _image_name(instance.image)
+    if name == instance._loaded_image:
+        return
+    storage = instance.image.storage
+    blobs.acquire(name, storage)
+    blobs.release(instance._loaded_image, storage, instance._replaced_variants)
+    instance._loaded_image = name
+
+
+@receiver(post_delete, sender=Product)
+def release_image(sender, instance, **kwargs):
+    name = _image_name(instance.image)
+    blobs.release(name, instance.image.storage, instance.image_variants)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        get_search_backend().index(instance.products.values_list("id", flat=True))
+
+
+# Drop cached public responses that may include the changed rows.
+@receiver([post_save, post_delete], sender=Offer)
+def invalidate_offer_cache(sender, instance, **kwargs):
+    invalidate("offers", f"offer:{instance.pk}")
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate("offers", "offer_detail")
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    invalidate("offers", "offer_detail", "categories", "category_stats")
+
+
+@receiver([post_save, post_delete], sender=Offer)
+def invalidate_offer_dashboard(sender, instance, **kwargs):
+    invalidate_dashboards(instance.created_by_id)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_dashboard(sender, instance, **kwargs):
+    invalidate_dashboards(instance.seller_id)
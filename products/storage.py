@@ -0,0 +1,60 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+BLOB_PREFIX = "blobs"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names every file by the SHA-256 of its bytes,
+    e.g. ``blobs/3f/a9/3fa9...c2.jpg``. Uploads are hashed while they are
+    streamed to a temporary file in chunks, and an upload whose digest is
+    already stored is discarded instead of written twice. The requested name
+    only contributes its extension.
+
+    Names are immutable, so the files can be served with far-future cache
+    headers. Reference counting and cleanup live in products.blobs.
+    """
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()[:10]
+        temp_dir = self.path(posixpath.join(BLOB_PREFIX, "tmp"))
+        os.makedirs(temp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                digest.update(chunk)
+                temp.write(chunk)
+
+        hexdigest = digest.hexdigest()
+        final_name = posixpath.join(BLOB_PREFIX, hexdigest[:2], hexdigest[2:4], f"{hexdigest}{extension}")
+        final_path = self.path(final_name)
+        if os.path.exists(final_path):
+            os.unlink(temp.name)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp.name, self.file_permissions_mode)
+            os.replace(temp.name, final_path)
+        return final_name
+
+    def get_available_name(self, name, max_length=None):
+        # Collisions are resolved by content in _save, never by renaming.
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    return content_addressed_storage
@@ -0,0 +1,70 @@
+from django.db.models import Count
+
+from .models import ProductTag, Tag
+
+
+TAG_MAX_LENGTH = 50
+
+# Number of tags returned in facet counts, most used first.
+TAG_FACET_LIMIT = 50
+
+
+def parse_tags(value):
+    """Split a comma-separated tag string into normalized, de-duplicated names."""
+    names = []
+    for name in (value or "").split(","):
+        name = name.strip().lower()[:TAG_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names):
+    """Return a ``{name: id}`` map for ``names``, creating missing tags in one insert."""
+    tags = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    missing = [name for name in names if name not in tags]
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        tags.update(Tag.objects.filter(name__in=missing).values_list("name", "id"))
+    return tags
+
+
+def sync_product_tags(product):
+    """Bring the ProductTag rows of ``product`` in line with ``product.tags``."""
+    wanted = set(get_or_create_tags(parse_tags(product.tags)).values())
+    current = set(ProductTag.objects.filter(product=product).values_list("tag_id", flat=True))
+    if current - wanted:
+        ProductTag.objects.filter(product=product, tag_id__in=current - wanted).delete()
+    if wanted - current:
+        ProductTag.objects.bulk_create(
+            [ProductTag(product=product, tag_id=tag_id) for tag_id in wanted - current],
+            ignore_conflicts=True,
+        )
+
+
+def filter_by_tags(products, tags, match="any"):
+    """
+    Restrict ``products`` to those tagged with any (or, with ``match="all"``,
+    every one) of the comma-separated ``tags``. Resolves names to ids first so
+    the join table is only probed through its (tag, product) index.
+    """
+    names = parse_tags(tags)
+    tag_ids = list(Tag.objects.filter(name__in=names).values_list("id", flat=True))
+    if not tag_ids or (match == "all" and len(tag_ids) < len(names)):
+        return products.none()
+
+    links = ProductTag.objects.filter(tag_id__in=tag_ids)
+    if match == "all":
+        links = links.values("product_id").annotate(matched=Count("tag_id")).filter(matched=len(tag_ids))
+    return products.filter(id__in=links.values("product_id"))
+
+
+def tag_facets(products, limit=TAG_FACET_LIMIT):
+    """Per-tag product counts over ``products``, most used first."""
+    facets = (
+        ProductTag.objects.filter(product__in=products.values("id"))
+        .values("tag__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "tag__name")[:limit]
+    )
+    return {facet["tag__name"]: facet["count"] for facet in facets}
@@ -1,3 +1,684 @@
-from django.test import TestCase
+import base64
+import json
+import re
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from ninja_jwt.tokens import RefreshToken
+from PIL import Image
+
+from orders.models import Order
+from orders.placement import place_order
+from users.models import User
+from .cache import get_cache, get_generations, invalidate, stats
+from .expiry import sweep_expired_offers
+from .images import VARIANTS, generate_variants
+from .models import Category, CategoryPriceStats, MediaBlob, Offer, Product, ProductTag
+from .pagination import OFFER_ORDERINGS
+from .price_stats import refresh_category_price_stats
+from .search import IContainsBackend, SQLiteFTSBackend, get_search_backend
+from .tags import filter_by_tags, tag_facets
+
+
+# A plan step that walks a whole table without any index, e.g. "SCAN products_offer".
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+
+
+class OfferListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        category = Category.objects.create(name="Crop")
+        expires_at = timezone.now() + timedelta(days=7)
+        for i in range(30):
+            product = Product.objects.create(
+                name=f"Product {i}",
+                description="Fresh produce",
+                category=category,
+                price=10,
+                stock=100,
+                seller=seller,
+                image=f"products/product-{i}.jpg",
+            )
+            Offer.objects.create(
+                product=product,
+                offer_type="Sell",
+                price_per_unit=10 + i,
+                quantity=5,
+                min_order=1,
+                max_order=5,
+                created_by=seller,
+                expires_at=expires_at,
+            )
+
+    def setUp(self):
+        get_cache().clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_list_offers_query_count_is_independent_of_page_size(self):
+        small, small_page = self.count_queries("/api/public_offers/offers/?limit=2")
+        large, large_page = self.count_queries("/api/public_offers/offers/?limit=30")
+        self.assertEqual(len(small_page["offers"]), 2)
+        self.assertEqual(len(large_page["offers"]), 30)
+        self.assertEqual(small, large)
+
+    def test_list_offers_returns_absolute_image_urls(self):
+        _, page = self.count_queries("/api/public_offers/offers/?limit=1")
+        offer = page["offers"][0]
+        self.assertTrue(offer["product__image"].startswith("http://testserver/media/products/"))
+        self.assertEqual(offer["product__category__name"], "Crop")
+
+    def test_get_offer_queries(self):
+        offer = Offer.objects.first()
+        # One query for the ETag version, one for the offer itself.
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/public_offers/offers/{offer.id}/")
+        self.assertEqual(response.json()["category"], "Crop")
+
+    def test_get_offer_revalidation_returns_304(self):
+        offer = Offer.objects.first()
+        url = f"/api/public_offers/offers/{offer.id}/"
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_list_revalidation_notices_a_sold_out_offer(self):
+        url = "/api/public_offers/offers/?limit=30"
+        before = self.client.get(url)
+        self.assertNotIn("Last-Modified", before)
+        offer = Offer.objects.order_by("id").first()
+        buyer = User.objects.create_user(username="buyer", password="secret", role="supplier")
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(buyer, offer.id, offer.quantity)
+
+        for headers in ({"If-None-Match": before["ETag"]}, {"If-Modified-Since": http_date(time.time() + 60)}):
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200, headers)
+            self.assertNotIn(offer.id, [row["id"] for row in response.json()["offers"]])
+
+
+class OfferCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=Category.objects.create(name="Crop"), price=10,
+            stock=100, seller=seller,
+        )
+        created_at = timezone.now() - timedelta(hours=1)
+        for i in range(11):
+            offer = Offer.objects.create(
+                product=product, offer_type="Sell", price_per_unit=5 + i % 3, quantity=5, min_order=1, max_order=5,
+                created_by=seller, expires_at=timezone.now() + timedelta(days=7),
+            )
+            # Ties on both sort keys, so only the id breaks them.
+            Offer.objects.filter(id=offer.id).update(created_at=created_at + timedelta(minutes=i // 4))
+
+    def setUp(self):
+        get_cache().clear()
+
+    def walk(self, ordering):
+        seen, cursor = [], None
+        while True:
+            url = f"/api/public_offers/offers/?ordering={ordering}&limit=3" + (f"&cursor={cursor}" if cursor else "")
+            page = self.client.get(url).json()
+            self.assertEqual(page["total_count"], None if cursor else 11)
+            seen += [offer["id"] for offer in page["offers"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    def test_cursor_pages_cover_every_offer_once_in_order(self):
+        for ordering, fields in OFFER_ORDERINGS.items():
+            expected = list(Offer.objects.order_by(*fields).values_list("id", flat=True))
+            self.assertEqual(self.walk(ordering), expected, ordering)
+
+    def test_malformed_cursors_are_rejected(self):
+        def cursor(*payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+        when = timezone.now().isoformat()
+        cases = [
+            ("newest", "not-base64!"),
+            ("newest", cursor("newest", 5)),
+            ("newest", cursor("newest", None)),
+            ("newest", cursor("newest", [when])),
+            ("newest", cursor("newest", [None, "1"])),
+            ("newest", cursor("newest", [{}, "1"])),
+            ("newest", cursor("newest", ["not a date", "1"])),
+            ("newest", cursor("newest", [when, "x"])),
+            ("price", cursor("price", ["cheap", "1"])),
+        ]
+        for url in ("/api/public_offers/offers/", "/api/products/"):
+            for ordering, value in cases:
+                response = self.client.get(url, {"ordering": ordering, "cursor": value})
+                self.assertEqual(response.json(), {"error": "Invalid cursor"}, (url, value))
+
+    def test_exact_count_defaults_on_for_offsets_and_off_for_cursors(self):
+        first = self.client.get("/api/public_offers/offers/?limit=3&offset=3").json()
+        self.assertEqual(first["total_count"], 11)
+        cursor = first["next_cursor"]
+        self.assertIsNone(self.client.get(f"/api/public_offers/offers/?limit=3&cursor={cursor}").json()["total_count"])
+        counted = self.client.get(f"/api/public_offers/offers/?limit=3&cursor={cursor}&with_total=true").json()
+        self.assertEqual(counted["total_count"], 11)
+        self.assertEqual(
+            self.client.get("/api/public_offers/offers/?cursor=garbage").json(), {"error": "Invalid cursor"},
+        )
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite specific")
+class QueryPlanTests(TestCase):
+    """
+    Run each endpoint, EXPLAIN every query it issued and fail if SQLite
+    falls back to a full scan of a table instead of using an index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seller", password="secret", role="farmer")
+        category = Category.objects.create(name="Crop")
+        product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=100,
+            seller=cls.user, tags="grain,organic",
+        )
+        cls.offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=12, quantity=5, min_order=1, max_order=5,
+            created_by=cls.user, expires_at=timezone.now() + timedelta(days=7),
+        )
+        cls.order = Order.objects.create(buyer=cls.user, offer=cls.offer, quantity=1, total_price=12)
+        cls.token = str(RefreshToken.for_user(cls.user).access_token)
+
+    def setUp(self):
+        get_cache().clear()
+
+    def assertNoFullScans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers={"Authorization": f"Bearer {self.token}"})
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+        self.assertEqual(response.status_code, 200, content)
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                self.assertIsNone(FULL_SCAN.match(step), f"{url} scans a table:\n{query['sql']}\n{plan}")
+
+    def test_list_offers(self):
+        self.assertNoFullScans("/api/public_offers/offers/")
+
+    def test_list_offers_by_price_and_type(self):
+        self.assertNoFullScans("/api/public_offers/offers/?ordering=price&offer_type=sell&min_price=1&max_price=50")
+
+    def test_list_offers_by_category(self):
+        self.assertNoFullScans("/api/public_offers/offers/?category=crop")
+
+    def test_get_offer(self):
+        self.assertNoFullScans(f"/api/public_offers/offers/{self.offer.id}/")
+
+    def test_category_price_stats(self):
+        refresh_category_price_stats()
+        self.assertNoFullScans("/api/public_offers/categories/stats/?category=crop&offer_type=sell")
+
+    def test_search_offers(self):
+        self.assertNoFullScans("/api/products/offers/search/?offer_type=sell")
+        self.assertNoFullScans("/api/products/offers/search/?query=mai")
+
+    def test_my_offers(self):
+        self.assertNoFullScans("/api/products/my/offers/")
+
+    def test_list_products(self):
+        self.assertNoFullScans("/api/products/?category=crop&ordering=price&min_price=1")
+        self.assertNoFullScans("/api/products/?tags=grain,organic&tag_match=all&facets=true")
+
+    def test_sales_analytics(self):
+        self.assertNoFullScans("/api/products/analytics/?days=30")
+
+    def test_list_orders(self):
+        self.assertNoFullScans("/api/orders/list/")
+        self.assertNoFullScans("/api/orders/list/?limit=20")
+
+    def test_export_orders(self):
+        self.assertNoFullScans("/api/orders/export/?start=2020-01-01&end=2030-01-01")
+        self.assertNoFullScans("/api/orders/export/?side=seller&format=jsonl")
+
+    def test_get_order(self):
+        self.assertNoFullScans(f"/api/orders/{self.order.id}/")
+
+
+class CategoryPriceStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        crop = Category.objects.create(name="Crop")
+        tool = Category.objects.create(name="Tool")
+        expires_at = timezone.now() + timedelta(days=7)
+        for category, offer_type, prices in [
+            (crop, "Sell", range(1, 11)),
+            (crop, "Buy", [4, 6]),
+            (tool, "Sell", [100]),
+        ]:
+            product = Product.objects.create(name="Item", description="", category=category, price=1, stock=10,
+                                             seller=seller)
+            for price in prices:
+                Offer.objects.create(product=product, offer_type=offer_type, price_per_unit=price, quantity=1,
+                                     min_order=1, max_order=1, created_by=seller, expires_at=expires_at)
+        Offer.objects.create(product=product, offer_type="Sell", price_per_unit=999, quantity=1, min_order=1,
+                             max_order=1, created_by=seller, expires_at=expires_at, is_active=False)
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_refresh_computes_percentiles_per_category_and_type(self):
+        result = refresh_category_price_stats()
+        self.assertEqual((result.offers, result.groups), (13, 3))
+        crop_sell = CategoryPriceStats.objects.get(category__name="Crop", offer_type="Sell")
+        self.assertEqual(crop_sell.offer_count, 10)
+        self.assertEqual((crop_sell.min_price, crop_sell.max_price), (1, 10))
+        self.assertEqual((crop_sell.mean_price, crop_sell.median_price), (Decimal("5.50"), Decimal("5.50")))
+        self.assertEqual((crop_sell.p10_price, crop_sell.p90_price), (Decimal("1.90"), Decimal("9.10")))
+        tool_sell = CategoryPriceStats.objects.get(category__name="Tool")
+        self.assertEqual((tool_sell.p10_price, tool_sell.p90_price), (100, 100))
+
+    def test_endpoint_serves_stored_stats(self):
+        refresh_category_price_stats()
+        response = self.client.get("/api/public_offers/categories/stats/?category=crop")
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()["stats"]
+        self.assertEqual([row["offer_type"] for row in stats], ["Buy", "Sell"])
+        self.assertEqual(stats[0]["median_price"], "5.00")
+
+
+@mock.patch("products.signals.schedule_variants")
+class ContentAddressedImageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        self.category = Category.objects.create(name="Crop")
+
+    def create_product(self, content):
+        product = Product(name="Maize", description="White maize", category=self.category, price=10,
+                          stock=100, seller=self.seller)
+        product.image.save("upload.jpg", ContentFile(content), save=False)
+        product.save()
+        return product
+
+    def test_identical_uploads_share_one_file(self, schedule_variants):
+        first = self.create_product(b"same bytes")
+        second = self.create_product(b"same bytes")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^blobs/\w{2}/\w{2}/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 2)
+
+    def test_file_is_deleted_with_its_last_product(self, schedule_variants):
+        first = self.create_product(b"same bytes")
+        second = self.create_product(b"same bytes")
+        storage = first.image.storage
+        name = first.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_file_survives_a_release_raced_by_an_upload_of_the_same_bytes(self, schedule_variants):
+        first = self.create_product(b"same bytes")
+        storage, name = first.image.storage, first.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        # The upload reuses the file before the delete callback runs.
+        second = self.create_product(b"same bytes")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+
+    def test_replacing_an_image_releases_the_old_one(self, schedule_variants):
+        product = self.create_product(b"old bytes")
+        old_name = product.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image.save("new.jpg", ContentFile(b"new bytes"))
+        self.assertFalse(product.image.storage.exists(old_name))
+        self.assertEqual(MediaBlob.objects.get(name=product.image.name).ref_count, 1)
+
+
+@mock.patch("products.signals.schedule_variants")
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        get_cache().clear()
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        category = Category.objects.create(name="Crop")
+        self.product = Product(name="Maize", description="White maize", category=category, price=10,
+                               stock=100, seller=seller)
+        buffer = BytesIO()
+        Image.new("RGB", (1600, 1200), "green").save(buffer, "JPEG")
+        self.product.image.save("upload.jpg", ContentFile(buffer.getvalue()), save=False)
+        self.product.save()
+        self.offer = Offer.objects.create(
+            product=self.product, offer_type="Sell", price_per_unit=5, quantity=5, min_order=1, max_order=5,
+            created_by=seller, expires_at=timezone.now() + timedelta(days=7),
+        )
+
+    def test_variants_are_written_at_their_sizes(self, schedule_variants):
+        variants = generate_variants(self.product.id)
+        self.assertEqual(set(variants), {"source", *VARIANTS})
+        storage = self.product.image.storage
+        for variant, (size, image_format, _, _) in VARIANTS.items():
+            with storage.open(variants[variant]) as f:
+                image = Image.open(f)
+                self.assertEqual((image.format, max(image.size)), (image_format, size), variant)
+        self.assertEqual(Product.objects.get(id=self.product.id).image_variants, variants)
+
+    def test_offers_serve_variant_urls_once_generated(self, schedule_variants):
+        detail_url = f"/api/public_offers/offers/{self.offer.id}/"
+        before = self.client.get(detail_url)
+        self.assertIsNone(before.json()["image_url_webp"])
+        self.client.get("/api/public_offers/offers/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            variants = generate_variants(self.product.id)
+
+        # A stale ETag no longer matches, and the cached bodies are dropped.
+        response = self.client.get(detail_url, headers={"If-None-Match": before["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["image_url"].endswith(variants["medium"]))
+        self.assertTrue(response.json()["image_url_webp"].endswith(variants["medium_webp"]))
+        card = self.client.get("/api/public_offers/offers/").json()["offers"][0]
+        self.assertTrue(card["product__image"].endswith(variants["thumb"]))
+        self.assertTrue(card["product__image_webp"].endswith(variants["thumb_webp"]))
+
+
+class ExpirySweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        category = Category.objects.create(name="Crop")
+        cls.product = Product.objects.create(
+            name="Maize", description="White maize", category=category, price=10, stock=50, seller=seller,
+        )
+        now = timezone.now()
+        cls.offers = {
+            (offer_type, expired): Offer.objects.create(
+                product=cls.product, offer_type=offer_type, price_per_unit=5, quantity=7, min_order=1,
+                max_order=7, created_by=seller,
+                expires_at=now + (timedelta(hours=-1) if expired else timedelta(days=1)),
+            )
+            for offer_type in ("Sell", "Buy")
+            for expired in (True, False)
+        }
+
+    def test_expired_offers_are_closed_and_sell_quantity_released(self):
+        result = sweep_expired_offers(batch_size=1)
+        self.assertEqual((result.offers, result.batches, result.released), (2, 2, 7))
+
+        for (offer_type, expired), offer in self.offers.items():
+            offer.refresh_from_db()
+            expected = (False, 0) if expired else (True, 7)
+            self.assertEqual((offer.is_active, offer.quantity), expected, (offer_type, expired))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 57)
+
+    def test_second_run_changes_nothing(self):
+        call_command("sweep_expired_offers", stdout=StringIO())
+        out = StringIO()
+        call_command("sweep_expired_offers", stdout=out)
+        self.assertIn("Expired 0 offers in 0 batches, released 0 units", out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 57)
+
+
+class ProductImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        Category.objects.create(name="Crop")
+
+    def upload(self, name, content, **params):
+        token = RefreshToken.for_user(self.seller).access_token
+        response = self.client.post(
+            f"/api/products/import/?{urlencode(params)}", {"file": SimpleUploadedFile(name, content)},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_csv_rows_are_imported_with_per_row_errors(self):
+        report = self.upload("products.csv", (
+            "name,description,category,price,stock,tags\n"
+            "Maize,White maize,crop,12.50,40,\"Grain, Organic\"\n"
+            "Beans,,Crop,-1,10,\n"
+            "Hoe,,Tools,3,1,\n"
+            "Sorghum,Red sorghum,Crop,8,5,grain\n"
+        ).encode(), batch_size=1)
+
+        self.assertEqual((report["rows"], report["created"], report["error_count"]), (4, 2, 2))
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3])
+        self.assertIn("price", report["errors"][0]["error"])
+        self.assertEqual(report["errors"][1]["error"], "Unknown category 'Tools'")
+
+        products = Product.objects.filter(seller=self.seller)
+        self.assertEqual(sorted(products.values_list("name", flat=True)), ["Maize", "Sorghum"])
+        # bulk_create skips the signals, so tags and the search index are kept up by the importer.
+        self.assertEqual(
+            sorted(ProductTag.objects.values_list("product__name", "tag__name")),
+            [("Maize", "grain"), ("Maize", "organic"), ("Sorghum", "grain")],
+        )
+        found = get_search_backend().filter(Product.objects.all(), "sorghum", product_field="")
+        self.assertEqual(list(found.values_list("name", flat=True)), ["Sorghum"])
+
+    def test_jsonl_reports_lines_that_are_not_json(self):
+        report = self.upload("products.jsonl", (
+            b'{"name": "Maize", "category": "Crop", "price": "12", "stock": 4}\n'
+            b"\n"
+            b"not json\n"
+            b'{"name": "Beans", "category": "Crop", "price": 3}\n'
+        ))
+        self.assertEqual((report["rows"], report["created"], report["error_count"]), (3, 1, 2))
+        self.assertTrue(report["errors"][0]["error"].startswith("Invalid row"))
+        self.assertIn("stock", report["errors"][1]["error"])
+
+    def test_format_follows_the_parameter_over_the_extension(self):
+        jsonl = b'{"name": "Maize", "category": "Crop", "price": "12", "stock": 4}\n'
+        self.assertEqual(self.upload("products.csv", jsonl, format="jsonl")["created"], 1)
+        self.assertEqual(self.upload("products.txt", jsonl), {"error": "Unsupported format, use 'csv' or 'jsonl'"})
+
+    def test_files_that_are_not_utf8_are_reported(self):
+        report = self.upload("products.csv", "name,category,price,stock\nCaf\u00e9,Crop,1,1\n".encode("latin-1"))
+        self.assertEqual((report["created"], report["error_count"]), (0, 1))
+        self.assertIn("utf-8", report["errors"][0]["error"])
+
+    def test_command_imports_a_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as f:
+            f.write(b"name,category,price,stock\nMaize,Crop,1,1\nBeans,Crop,x,1\n")
+            f.flush()
+            out, err = StringIO(), StringIO()
+            call_command("import_products", f.name, seller="seller", stdout=out, stderr=err)
+        self.assertIn("Read 2 rows, created 1 products, 1 errors", out.getvalue())
+        self.assertIn("row 2: price", err.getvalue())
+
+
+@skipUnless(connection.vendor == "sqlite", "FTS5 is SQLite specific")
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        cls.crop = Category.objects.create(name="Crop")
+        cls.products = {
+            name: Product.objects.create(
+                name=name, description=description, category=cls.crop, price=10, stock=1, seller=seller, tags=tags,
+            )
+            for name, description, tags in [
+                ("Yellow maize", "Dried grain", "grain"),
+                ("Beans", "Goes well with maize flour", None),
+                ("Maize flour", "Sifted", "flour, maize"),
+                ("Hoe", "Steel blade", "tool"),
+            ]
+        }
+
+    def search(self, query, backend=None):
+        rows = (backend or SQLiteFTSBackend()).filter(Product.objects.all(), query, product_field="")
+        return list(rows.order_by("rank", "id").values_list("name", flat=True))
+
+    def test_name_and_tag_matches_rank_above_description_matches(self):
+        results = self.search("maize")
+        self.assertEqual(results[-1], "Beans")
+        self.assertEqual(set(results[:2]), {"Yellow maize", "Maize flour"})
+        # Terms match as prefixes and all of them are required.
+        self.assertEqual(self.search("mai flo"), ["Maize flour", "Beans"])
+        self.assertFalse(SQLiteFTSBackend().filter(Product.objects.all(), "  ", product_field="").exists())
+
+    def test_matches_the_unindexed_fallback(self):
+        for query in ("maize", "maize flour", "grain", "crop", "steel", "nothing"):
+            self.assertEqual(
+                sorted(self.search(query)), sorted(self.search(query, IContainsBackend())), query,
+            )
+
+    def test_index_follows_product_and_category_changes(self):
+        hoe = self.products["Hoe"]
+        hoe.name = "Garden rake"
+        hoe.save()
+        self.assertEqual(self.search("rake"), ["Garden rake"])
+        self.assertEqual(self.search("hoe"), [])
+
+        self.crop.name = "Cereal"
+        self.crop.save()
+        self.assertEqual(len(self.search("cereal")), 4)
+
+        hoe.delete()
+        self.assertEqual(self.search("rake"), [])
+
+
+class ProductTagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(username="seller", password="secret", role="farmer")
+        category = Category.objects.create(name="Crop")
+        cls.products = {
+            name: Product.objects.create(
+                name=name, description=name, category=category, price=10, stock=1, seller=seller, tags=tags,
+            )
+            for name, tags in [
+                ("Maize", "Grain, organic"),
+                ("Rice", "grain,GRAIN , irrigated"),
+                ("Beans", "organic"),
+                ("Hoe", None),
+            ]
+        }
+
+    def names(self, tags, match="any"):
+        return sorted(filter_by_tags(Product.objects.all(), tags, match).values_list("name", flat=True))
+
+    def links(self):
+        return sorted(ProductTag.objects.values_list("product__name", "tag__name"))
+
+    def test_any_and_all_matching(self):
+        self.assertEqual(self.names("grain, organic"), ["Beans", "Maize", "Rice"])
+        self.assertEqual(self.names("grain, organic", "all"), ["Maize"])
+        self.assertEqual(self.names("organic, unknown", "all"), [])
+        self.assertEqual(self.names(""), [])
+
+    def test_facet_counts_most_used_first(self):
+        self.assertEqual(tag_facets(Product.objects.all()), {"grain": 2, "organic": 2, "irrigated": 1})
+        self.assertEqual(tag_facets(Product.objects.filter(name="Rice")), {"grain": 1, "irrigated": 1})
+        self.assertEqual(tag_facets(Product.objects.all(), limit=1), {"grain": 2})
+
+    def test_tags_are_resynced_when_they_change(self):
+        maize = self.products["Maize"]
+        maize.tags = "organic, drought-tolerant"
+        maize.save()
+        self.assertEqual(self.names("grain"), ["Rice"])
+        self.assertEqual(self.names("drought-tolerant"), ["Maize"])
+        # Saving other fields leaves the links alone.
+        before = self.links()
+        maize.save(update_fields=["price"])
+        self.assertEqual(self.links(), before)
+
+    def test_backfill_migration_rebuilds_the_links(self):
+        expected = self.links()
+        ProductTag.objects.all().delete()
+        migration = import_module("products.migrations.0006_backfill_product_tags")
+        with mock.patch.object(migration, "BATCH_SIZE", 2):
+            migration.backfill_product_tags(apps, None)
+        self.assertEqual(self.links(), expected)
+
+
+class PublicResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="staff", password="secret", role="farmer", is_staff=True)
+        cls.farmer = User.objects.create_user(username="farmer", password="secret", role="farmer")
+        Category.objects.create(name="Crop")
+
+    def setUp(self):
+        get_cache().clear()
+        stats.reset()
+
+    def cache_stats(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get("/api/products/cache/stats/", headers={"Authorization": f"Bearer {token}"})
+
+    def categories(self):
+        return [category["name"] for category in self.client.get("/api/public_offers/categories/").json()]
+
+    def test_hits_misses_and_invalidation(self):
+        self.assertEqual(self.categories(), ["Crop"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.categories(), ["Crop"])
+        self.assertEqual(self.cache_stats(self.staff).json()["list_categories"], {
+            "hits": 1, "misses": 1, "hit_rate": 0.5,
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Livestock")
+        self.assertEqual(self.categories(), ["Crop", "Livestock"])
+
+    def test_generations_only_move_once_the_transaction_commits(self):
+        before = get_generations(["categories"])
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidate("categories")
+            self.assertEqual(get_generations(["categories"]), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_generations(["categories"]), before)
+
+    def test_stats_are_staff_only(self):
+        self.assertEqual(self.client.get("/api/products/cache/stats/").status_code, 401)
+        self.assertEqual(self.cache_stats(self.farmer).json(), {"error": "Only staff can view cache statistics"})
+        self.assertEqual(self.cache_stats(self.staff).status_code, 200)
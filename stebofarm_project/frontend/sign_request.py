@@ -1,9 +1,13 @@
 import requests
 from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import serialization
 import os
 import json
+import secrets
+import time
+from urllib.parse import urlsplit
 
 # Load the private key
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -26,20 +30,34 @@ if response.status_code != 200:
 payload = response.json()
 payload_json = json.dumps(payload).encode("utf-8")
 
-# Generate the signature
-signature = private_key.sign(
-    payload_json,
-    padding.PKCS1v15(),
-    hashes.SHA256(),
-)
-
 # Send the signed payload back to the backend
 REGISTER_URL = "http://127.0.0.1:8000/api/users/register/"
 
+# The signature covers a timestamp and a single-use nonce as well as the
+# request, so the backend rejects replays. Keep this message format in step
+# with users.frontend_keys.signing_message.
+timestamp = str(int(time.time()))
+nonce = secrets.token_hex(16)
+url = urlsplit(REGISTER_URL)
+path = url.path + (f"?{url.query}" if url.query else "")
+message = f"{timestamp}\n{nonce}\nPOST\n{path}\n".encode("utf-8") + payload_json
+
+# Generate the signature (Ed25519 or RSA, matching the registered public key)
+if isinstance(private_key, Ed25519PrivateKey):
+    signature = private_key.sign(message)
+else:
+    signature = private_key.sign(
+        message,
+        padding.PKCS1v15(),
+        hashes.SHA256(),
+    )
+
 headers = {
     "Content-Type": "application/json",
     "X-Signature": signature.hex(),
     "X-Unique-Key": UNIQUE_KEY,
+    "X-Timestamp": timestamp,
+    "X-Nonce": nonce,
 }
 
 response = requests.post(REGISTER_URL, headers=headers, data=payload_json)
@@ -1,18 +1,28 @@
-from cryptography.hazmat.primitives.asymmetric import rsa
+import argparse
+
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 
+# Ed25519 keys are small and fast to sign with; RSA-2048 is faster to verify
+parser = argparse.ArgumentParser(description="Generate a frontend signing key pair.")
+parser.add_argument("--algorithm", choices=["ed25519", "rsa"], default="rsa")
+args = parser.parse_args()
+
 # Generate private (secret) key
-private_key = rsa.generate_private_key(
-    public_exponent=65537,  # Standard value for RSA keys
-    key_size=2048,          # Key size in bits
-    backend=default_backend()
-)
+if args.algorithm == "ed25519":
+    private_key = ed25519.Ed25519PrivateKey.generate()
+else:
+    private_key = rsa.generate_private_key(
+        public_exponent=65537,  # Standard value for RSA keys
+        key_size=2048,          # Key size in bits
+        backend=default_backend()
+    )
 
 # Serialize private key to PEM format
 private_key_pem = private_key.private_bytes(
     encoding=serialization.Encoding.PEM,
-    format=serialization.PrivateFormat.TraditionalOpenSSL,
+    format=serialization.PrivateFormat.PKCS8,
     encryption_algorithm=serialization.NoEncryption()  # No password
 )
 
@@ -34,3 +44,4 @@ with open("keys/public_key.pem", "wb") as f:
     f.write(public_key_pem)
 
 print("Keys generated successfully: 'private_key.pem' and 'public_key.pem'")
+print("Register the frontend with the contents of 'public_key.pem' as its public_key.")
@@ -0,0 +1,54 @@
+"""
+Shared pieces of the bulk imports (products.importer, users.registration):
+readers for uploaded files and the report they return.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+
+
+# Errors beyond this are counted but not listed, so the report stays small.
+MAX_REPORTED_ERRORS = 1000
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row, error):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def as_dict(self):
+        return {"rows": self.rows, "created": self.created, "error_count": self.error_count, "errors": self.errors}
+
+
+def iter_csv(stream):
+    """
+    Rows of a binary CSV stream with a header line, read incrementally. A
+    file that cannot be decoded or parsed yields the error and ends there.
+    """
+    try:
+        yield from csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    except (UnicodeDecodeError, csv.Error) as e:
+        yield e
+
+
+def iter_jsonl(stream):
+    """Rows of a binary JSON Lines stream; blank lines are skipped, bad lines yield the error."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+READERS = {"csv": iter_csv, "jsonl": iter_jsonl}
@@ -1,18 +1,27 @@
-import os
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives import serialization
+import re
+import time
+
+from django.conf import settings
 from django.http import JsonResponse
-from users.models import FrontendApp
+from users.frontend_keys import SignatureError, frontend_keys, signing_message
+from users.nonces import get_nonce_store
 
-# Load public key
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-PUBLIC_KEY_PATH = os.path.join(BASE_DIR, "keys/public_key.pem")
+NONCE_PATTERN = re.compile(r"[A-Za-z0-9_-]{16,64}")
 
-with open(PUBLIC_KEY_PATH, "rb") as f:
-    public_key = serialization.load_pem_public_key(f.read())
 
 class SignatureVerificationMiddleware:
+    """
+    Reject requests that are not signed by a registered frontend. Keys come
+    from an in-memory registry (users.frontend_keys), so a request costs one
+    signature check and no queries. Frontends may sign with Ed25519 or RSA;
+    see the bench_signature_verification command for what each costs.
+
+    The signature covers X-Timestamp and X-Nonce as well as the request (see
+    users.frontend_keys.signing_message). A request is only accepted within
+    SIGNATURE_MAX_AGE seconds of its timestamp and only once per nonce
+    (users.nonces), so a captured request cannot be replayed.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
 
@@ -23,23 +32,33 @@ class SignatureVerificationMiddleware:
 
         # Verify the unique key
         unique_key = request.headers.get("X-Unique-Key")
-        if not unique_key or not FrontendApp.objects.filter(unique_key=unique_key).exists():
+        frontend = frontend_keys.get(unique_key) if unique_key else None
+        if frontend is None:
             return JsonResponse({"error": "Invalid or missing unique key"}, status=403)
 
         # Verify the signature
         signature = request.headers.get("X-Signature")
-        if not signature:
-            return JsonResponse({"error": "Missing signature"}, status=403)
+        timestamp = request.headers.get("X-Timestamp")
+        nonce = request.headers.get("X-Nonce")
+        if not signature or not timestamp or not nonce:
+            return JsonResponse({"error": "Missing signature, timestamp or nonce"}, status=403)
+        max_age = getattr(settings, "SIGNATURE_MAX_AGE", 300)
+        if not (timestamp.isascii() and timestamp.isdigit()) or abs(time.time() - int(timestamp)) > max_age:
+            return JsonResponse({"error": "Request timestamp is outside the allowed window"}, status=403)
+        if not NONCE_PATTERN.fullmatch(nonce):
+            return JsonResponse({"error": "Nonce must be 16-64 letters, digits, '-' or '_'"}, status=403)
 
+        message = signing_message(timestamp, nonce, request.method, request.get_full_path(), request.body)
         try:
-            payload = request.body
-            public_key.verify(
-                bytes.fromhex(signature),
-                payload,
-                padding.PKCS1v15(),
-                hashes.SHA256(),
-            )
-        except Exception as e:
+            frontend.verify(bytes.fromhex(signature), message)
+        except ValueError:
+            return JsonResponse({"error": "Invalid signature", "details": "Signature is not hex encoded"}, status=403)
+        except SignatureError as e:
             return JsonResponse({"error": "Invalid signature", "details": str(e)}, status=403)
 
+        # Only after the signature checks out, so forged requests cannot fill the store.
+        if not get_nonce_store().add(f"{frontend.app_id}:{nonce}", int(timestamp)):
+            return JsonResponse({"error": "Request has already been used"}, status=403)
+
+        request.frontend_app_id = frontend.app_id
         return self.get_response(request)
@@ -106,10 +106,35 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction begins so concurrent
+            # writers wait on the busy timeout instead of failing when they
+            # upgrade from a read lock (see orders.placement).
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Public marketplace responses use their own alias. Switch its backend to
+# django.core.cache.backends.filebased.FileBasedCache to share entries
+# between worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'public_offers': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'public-offers',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -147,6 +172,9 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Threads that generate product image variants after upload (products.images)
+IMAGE_VARIANT_WORKERS = 2
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'static'
 
@@ -166,6 +194,29 @@ NINJA_JWT = {
     'SIGNING_KEY': 'your-secret-key',
 }
 
+# Threads that hash passwords for the async login and registration
+# endpoints (users.hashing); 0 hashes inline on the event loop.
+PASSWORD_HASH_WORKERS = 4
+
+# Per-process cache of users resolved from JWTs (users.auth.CachedJWTAuth)
+JWT_USER_CACHE_SIZE = 10000
+JWT_USER_CACHE_TTL = 60  # seconds
+
+# Request signing (stebofarm_project.middleware.signature_verification).
+# Frontends registered without their own public key are verified with this
+# shared key, read on first use. Other processes see frontend key changes
+# after FRONTEND_KEY_REFRESH seconds.
+SIGNATURE_FALLBACK_PUBLIC_KEY = BASE_DIR / 'stebofarm_project' / 'keys' / 'public_key.pem'
+FRONTEND_KEY_REFRESH = 60  # seconds
+# Signed requests are accepted this many seconds either side of their
+# X-Timestamp, each nonce once. Nonces are remembered per process unless
+# SIGNATURE_NONCE_CACHE names a cache alias shared by every process.
+SIGNATURE_MAX_AGE = 300  # seconds
+SIGNATURE_NONCE_CACHE = None
+
+# How long a stored Idempotency-Key response is replayed (orders.idempotency)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
 
 # settings.py
 AUTH_USER_MODEL = 'users.User'
@@ -10,6 +10,8 @@ from users.api import public_router as public_router
 from products.api import router as products_router
 from products.api import public_offers as public_offers
 from community.api import router as community_router
+from orders.api import router as orders_router
+from notifications.api import router as notifications_router
 
 api = NinjaAPI()
 api.add_router("/public/", public_router)
@@ -17,6 +19,8 @@ api.add_router("/users/", users_router)
 api.add_router("/products/", products_router)
 api.add_router("/public_offers/", public_offers)
 api.add_router("/community/", community_router)
+api.add_router("/orders/", orders_router)
+api.add_router("/notifications/", notifications_router)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
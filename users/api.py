@@ -1,14 +1,22 @@
 import secrets
 from pydantic import BaseModel
-from django.contrib.auth import authenticate
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError
 from ninja_jwt.tokens import RefreshToken
-from ninja import Router
-from ninja_jwt.authentication import JWTAuth
+from ninja import File, Router
+from ninja.files import UploadedFile
+from .auth import CachedJWTAuth
+from .frontend_keys import SignatureError, algorithm_of, load_public_key
+from .dashboard import ROLE_NAMES, cached_dashboard
+from .hashing import aauthenticate, run_hasher
+from .registration import ONBOARD_BATCH_SIZE, onboard_users, registration_conflict, unique_values
 from typing import Optional
+from stebofarm_project.imports import READERS
 from .models import User, FrontendApp
 from .schemas import FrontendAppSchema, LoginSchema, UserRegistrationSchema, UserProfileUpdateSchema
 
-router = Router(auth=JWTAuth())
+router = Router(auth=CachedJWTAuth())
 public_router = Router()
 
 # Frontend Registration
@@ -18,51 +26,55 @@ def register_frontend(request, data: FrontendAppSchema):
     name = data.name
     if not name:
         return {"error": "Frontend name is required"}
+    public_key, algorithm = data.public_key or "", None
+    if public_key:
+        try:
+            algorithm = algorithm_of(load_public_key(public_key))
+        except SignatureError as e:
+            return {"error": str(e)}
 
     # Generate a unique key for the frontend
     unique_key = secrets.token_hex(32)
-    app, created = FrontendApp.objects.get_or_create(name=name, defaults={"unique_key": unique_key})
+    app, created = FrontendApp.objects.get_or_create(
+        name=name, defaults={"unique_key": unique_key, "public_key": public_key},
+    )
 
     if not created:
         return {"error": "Frontend with this name already exists"}
 
-    return {"message": "Frontend registered successfully", "unique_key": unique_key}
+    return {"message": "Frontend registered successfully", "unique_key": unique_key, "algorithm": algorithm}
 
 
 # User Registration
 @public_router.post("/register/")
-def register_user(request, data: UserRegistrationSchema):
-    if User.objects.filter(username=data.username).exists():
-        return {"error": "Username already exists"}
-    if User.objects.filter(email=data.email).exists():
-        return {"error": "Email already exists"}
+async def register_user(request, data: UserRegistrationSchema):
     if not data.national_id and not data.driving_license:
         return {"error": "Either National ID or Driving License must be provided"}
-    if data.national_id and User.objects.filter(national_id=data.national_id).exists():
-        return {"error": "National ID is already registered"}
-    if data.driving_license and User.objects.filter(driving_license=data.driving_license).exists():
-        return {"error": "Driving License is already registered"}
-
-    user = User.objects.create_user(
-        username=data.username,
-        email=data.email,
-        password=data.password,
+    # One query for all unique fields; the constraints catch a concurrent signup.
+    conflict = await sync_to_async(registration_conflict)(data)
+    if conflict:
+        return {"error": conflict}
+
+    # Hash in the worker pool so the event loop keeps serving other requests.
+    user = User(
+        **unique_values(data),
+        password=await run_hasher(make_password, data.password),
         role=data.role,
-        national_id=data.national_id,
-        driving_license=data.driving_license,
+        is_verified=False,
     )
-    user.is_verified = False
-    user.save()
+    try:
+        await user.asave()
+    except IntegrityError:
+        return {"error": await sync_to_async(registration_conflict)(data) or "User already exists"}
 
     return {"message": "User registered successfully. Verification pending.", "id": user.id}
 
 
 
-
 @public_router.post("/login/")
-def login_user(request, data: LoginSchema):
+async def login_user(request, data: LoginSchema):
     """Authenticate user and return tokens along with user data."""
-    user = authenticate(username=data.username, password=data.password)
+    user = await aauthenticate(request, data.username, data.password)
     if not user:
         return {"error": "Invalid username or password"}  # Login fails if credentials are wrong
 
@@ -104,7 +116,8 @@ def update_user_profile(request, data: UserProfileUpdateSchema):
         user.profile.location = data.location
     if data.contact_number:
         user.profile.contact_number = data.contact_number
-    user.save()
+    # The fields live on the profile row; saving it also drops the cached user.
+    user.profile.save()
     return {"message": "Profile updated successfully"}
 
 # Dashboard
@@ -114,14 +127,9 @@ def get_dashboard(request):
     if not user.is_verified:
         return {"error": "User is not verified. Please complete verification."}
 
-    if user.role == 'farmer':
-        return {"role": "Farmer", "products_count": 10, "orders_count": 5}  # Example
-    elif user.role == 'supplier':
-        return {"role": "Supplier", "inventory_count": 8, "pending_orders_count": 2}  # Example
-    elif user.role == 'expert':
-        return {"role": "Expert", "pending_services_count": 4}  # Example
-    else:
+    if user.role not in ROLE_NAMES:
         return {"error": "Invalid role"}
+    return cached_dashboard(user)
 
 # Admin Verification
 @router.post("/verify/{user_id}/")
@@ -138,6 +146,23 @@ def verify_user(request, user_id: int):
     except User.DoesNotExist:
         return {"error": "User not found"}
 
+# Bulk onboarding, e.g. all members of a cooperative
+@router.post("/onboard/")
+def onboard(request, file: UploadedFile = File(...), format: Optional[str] = None, batch_size: int = ONBOARD_BATCH_SIZE):
+    """
+    Register users from a CSV or JSON Lines upload with the registration
+    fields (username, email, password, role, national_id or driving_license,
+    and optional location and contact_number). Returns per-row errors.
+    """
+    if not request.auth.is_superuser:
+        return {"error": "Only administrators can onboard users"}
+    format = (format or file.name.rsplit(".", 1)[-1]).lower()
+    if format not in READERS:
+        return {"error": "Unsupported format, use 'csv' or 'jsonl'"}
+    if batch_size < 1:
+        return {"error": "batch_size must be positive"}
+    return onboard_users(READERS[format](file.file), batch_size=batch_size).as_dict()
+
 # List Users
 @router.get("/list/")
 def list_users(request, role: Optional[str] = None):
@@ -0,0 +1,123 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+from ninja_jwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Thread-safe LRU of authenticated users with a TTL, keyed by
+    ``(user_id, jti)``. ``invalidate(user_id)`` drops every cached token of
+    that user. Only users with cached tokens are tracked, so memory stays
+    bounded by ``max_size``.
+
+    A load that started before an invalidation is not cached: callers take
+    ``generation()`` before loading and pass it to ``set``, which ignores it
+    once any invalidation has happened since.
+
+    The cache is per process: a change made in another process is picked up
+    when the entry's TTL runs out.
+    """
+
+    def __init__(self, max_size=10_000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tokens = {}  # user_id -> token ids with an entry
+        self._generation = 0
+
+    def get(self, user_id, token_id):
+        key = (user_id, token_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+        # Handlers may change request.auth; never hand out the cached instance.
+        return copy.deepcopy(user)
+
+    def set(self, user_id, token_id, user, generation):
+        with self._lock:
+            if generation != self._generation:
+                return  # invalidated while the user was being loaded
+            self._entries[(user_id, token_id)] = (copy.deepcopy(user), time.monotonic() + self.ttl)
+            self._entries.move_to_end((user_id, token_id))
+            self._tokens.setdefault(user_id, set()).add(token_id)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        user_id, token_id = key
+        del self._entries[key]
+        tokens = self._tokens[user_id]
+        tokens.discard(token_id)
+        if not tokens:
+            del self._tokens[user_id]
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                for token_id in self._tokens.pop(user_id, ()):
+                    del self._entries[(user_id, token_id)]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tokens.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, "JWT_USER_CACHE_SIZE", 10_000),
+    ttl=getattr(settings, "JWT_USER_CACHE_TTL", 60),
+)
+
+
+class CachedJWTAuth(JWTAuth):
+    """
+    JWTAuth that resolves the token's user from ``user_cache`` and loads it,
+    with its profile, in one query on a miss. Entries are dropped when the
+    user or their profile is saved (see users.signals).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        token_id = validated_token.get(api_settings.JTI_CLAIM)
+
+        user = user_cache.get(user_id, token_id)
+        if user is None:
+            generation = user_cache.generation()
+            user = (
+                self.user_model.objects.select_related("profile")
+                .filter(**{api_settings.USER_ID_FIELD: user_id})
+                .first()
+            )
+            if user is None:
+                raise AuthenticationFailed(_("User not found"))
+            user_cache.set(user_id, token_id, user, generation)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"))
+        return user
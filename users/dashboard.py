@@ -0,0 +1,66 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from orders.models import Order
+from products.cache import get_cache, get_generations, invalidate
+from products.models import Offer, Product
+from .models import User
+
+
+DASHBOARD_TIMEOUT = 300
+
+ROLE_NAMES = {"farmer": "Farmer", "supplier": "Supplier", "expert": "Expert"}
+
+
+def _count(queryset, group_by):
+    # A correlated COUNT(*) that the outer query evaluates once per user.
+    counted = queryset.order_by().values(group_by).annotate(n=Count("*")).values("n")
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def seller_counts(user_id):
+    """
+    Dashboard counts of a farmer or supplier, read in one round trip: each
+    count is a scalar subquery served by an index on the user's rows.
+    """
+    user = OuterRef("pk")
+    return User.objects.filter(pk=user_id).annotate(
+        products_count=_count(Product.objects.filter(seller=user), "seller"),
+        active_offers_count=_count(Offer.objects.filter(created_by=user, is_active=True), "created_by"),
+        pending_orders_received_count=_count(
+            Order.objects.filter(offer__product__seller=user, status="Pending"), "status",
+        ),
+        pending_orders_placed_count=_count(Order.objects.filter(buyer=user, status="Pending"), "buyer"),
+    ).values(
+        "products_count", "active_offers_count", "pending_orders_received_count", "pending_orders_placed_count",
+    ).get()
+
+
+def build_dashboard(user):
+    if user.role in ("farmer", "supplier"):
+        return {"role": ROLE_NAMES[user.role], **seller_counts(user.pk)}
+    # Expert services are not modelled yet, so there is nothing to count.
+    return {"role": ROLE_NAMES[user.role], "pending_services_count": None}
+
+
+def _namespace(user_id):
+    return f"dashboard:{user_id}"
+
+
+def cached_dashboard(user):
+    """The user's dashboard, cached until one of their products, offers or orders changes."""
+    cache = get_cache()
+    generation, = get_generations([_namespace(user.pk)])
+    key = f"dashboard:{user.pk}:{generation}"
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user)
+        cache.set(key, dashboard, DASHBOARD_TIMEOUT)
+    return dashboard
+
+
+def invalidate_dashboards(*user_ids):
+    """Drop the cached dashboards of ``user_ids`` once the current transaction commits."""
+    namespaces = {_namespace(user_id) for user_id in user_ids if user_id is not None}
+    if namespaces:
+        invalidate(*namespaces)
@@ -0,0 +1,125 @@
+import threading
+import time
+from functools import cached_property
+from pathlib import Path
+
+from cryptography.exceptions import InvalidSignature, UnsupportedAlgorithm
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from django.conf import settings
+
+from .models import FrontendApp
+
+
+class SignatureError(Exception):
+    pass
+
+
+def load_public_key(pem):
+    """Parse a PEM public key, accepting the algorithms verify_signature supports."""
+    try:
+        key = serialization.load_pem_public_key(pem.encode() if isinstance(pem, str) else pem)
+    except (ValueError, TypeError, UnsupportedAlgorithm):
+        raise SignatureError("Invalid public key")
+    if not isinstance(key, (Ed25519PublicKey, RSAPublicKey)):
+        raise SignatureError("Only Ed25519 and RSA public keys are supported")
+    return key
+
+
+def algorithm_of(key):
+    return "ed25519" if isinstance(key, Ed25519PublicKey) else "rsa-sha256"
+
+
+def signing_message(timestamp, nonce, method, path, body):
+    """
+    The bytes a frontend signs: the X-Timestamp and X-Nonce headers, the
+    method and the path with its query string, one per line, then the body.
+    frontend/sign_request.py builds the same message.
+    """
+    return f"{timestamp}\n{nonce}\n{method}\n{path}\n".encode() + body
+
+
+def verify_signature(key, signature, payload):
+    """Raise SignatureError unless ``signature`` is ``key``'s signature of ``payload``."""
+    try:
+        if isinstance(key, Ed25519PublicKey):
+            key.verify(signature, payload)
+        else:
+            key.verify(signature, payload, padding.PKCS1v15(), hashes.SHA256())
+    except InvalidSignature:
+        raise SignatureError("Invalid signature")
+
+
+_fallback_lock = threading.Lock()
+_fallback = {}
+
+
+def fallback_public_key():
+    """
+    The shared key of the original single-key setup, used for frontends
+    registered without their own key. Read on first use; None if the file
+    is not there.
+    """
+    path = getattr(settings, "SIGNATURE_FALLBACK_PUBLIC_KEY", None)
+    with _fallback_lock:
+        if path not in _fallback:
+            try:
+                _fallback[path] = load_public_key(Path(path).read_bytes()) if path else None
+            except OSError:
+                _fallback[path] = None
+        return _fallback[path]
+
+
+class FrontendKey:
+    def __init__(self, app_id, name, pem):
+        self.app_id = app_id
+        self.name = name
+        self.pem = pem
+
+    @cached_property
+    def public_key(self):
+        # Parsed on the first request from this frontend, not when the registry loads.
+        key = load_public_key(self.pem) if self.pem else fallback_public_key()
+        if key is None:
+            raise SignatureError("No public key registered for this frontend")
+        return key
+
+    def verify(self, signature, payload):
+        verify_signature(self.public_key, signature, payload)
+
+
+class FrontendKeyRegistry:
+    """
+    In-memory map of unique key to FrontendKey, so verifying a request
+    needs no query. It is loaded on first use and reloaded after
+    ``invalidate()`` (called when a FrontendApp changes, see users.signals)
+    or once ``ttl`` seconds have passed, which is how changes made by other
+    processes are picked up.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._keys = None
+        self._loaded_at = 0.0
+
+    def _load(self):
+        rows = FrontendApp.objects.values_list("unique_key", "id", "name", "public_key")
+        return {unique_key: FrontendKey(app_id, name, pem) for unique_key, app_id, name, pem in rows}
+
+    def get(self, unique_key):
+        with self._lock:
+            keys = self._keys
+            if keys is None or time.monotonic() - self._loaded_at > self.ttl:
+                keys = self._keys = self._load()
+                self._loaded_at = time.monotonic()
+        return keys.get(unique_key)
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+
+
+frontend_keys = FrontendKeyRegistry(ttl=getattr(settings, "FRONTEND_KEY_REFRESH", 60))
@@ -0,0 +1,87 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.signals import user_login_failed
+
+from .models import User
+
+MODEL_BACKEND = "django.contrib.auth.backends.ModelBackend"
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, "PASSWORD_HASH_WORKERS", 4)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash") if workers else None
+    return _executor
+
+
+async def run_hasher(func, *args):
+    """
+    Run a password hashing function off the event loop, in a pool of at most
+    PASSWORD_HASH_WORKERS threads. PBKDF2 and the other hashlib-based hashers
+    release the GIL, so other requests keep being served while they run.
+    With PASSWORD_HASH_WORKERS = 0 the hash runs inline and blocks the loop.
+    """
+    executor = get_executor()
+    if executor is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def _must_update(encoded):
+    try:
+        current = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher("default")
+    return current.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+async def acheck_password(user, raw_password):
+    """
+    Check ``raw_password`` against ``user`` and, if it matches a hash made
+    with an older hasher or fewer iterations, store a fresh hash. The update
+    is conditional on the old hash so a concurrent password change wins.
+    """
+    encoded = user.password
+    if not await run_hasher(check_password, raw_password, encoded):
+        return False
+    if _must_update(encoded):
+        user.password = await run_hasher(make_password, raw_password)
+        await User.objects.filter(pk=user.pk, password=encoded).aupdate(password=user.password)
+    return True
+
+
+async def aauthenticate(request, username, password):
+    """
+    Async counterpart of ``authenticate``: returns the user these credentials
+    belong to, or None. With the default ModelBackend the hash is checked in
+    the pool above; Django's own ``aauthenticate`` would run it in the single
+    thread all sync_to_async calls share. Any other AUTHENTICATION_BACKENDS
+    are handed to Django as they are. Either way a failed login sends
+    ``user_login_failed``.
+    """
+    if settings.AUTHENTICATION_BACKENDS != [MODEL_BACKEND]:
+        return await auth.aauthenticate(request, username=username, password=password)
+    backend = ModelBackend()
+    user = await User.objects.filter(**{User.USERNAME_FIELD: username}).afirst()
+    if user is None:
+        # Hash anyway so unknown usernames take as long as wrong passwords.
+        await run_hasher(make_password, password)
+    elif await acheck_password(user, password) and backend.user_can_authenticate(user):
+        user.backend = MODEL_BACKEND
+        return user
+    await user_login_failed.asend(
+        sender=auth.__name__,
+        credentials=auth._clean_credentials({"username": username, "password": password}),
+        request=request,
+    )
+    return None
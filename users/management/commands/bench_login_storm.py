@@ -0,0 +1,87 @@
+import asyncio
+import math
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from users import hashing
+from users.models import User
+
+
+PROBE_URL = "/api/public_offers/categories/"
+
+
+def p99(values):
+    values = sorted(values)
+    return values[math.ceil(len(values) * 0.99) - 1] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the ASGI application in-process with a storm of concurrent logins and report logins/s and the "
+        "latency of an unrelated endpoint. Writes one user to the configured database and removes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent login loops.")
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument(
+            "--workers", type=int, action="append",
+            help="PASSWORD_HASH_WORKERS values to compare; 0 hashes inline on the event loop. Repeatable.",
+        )
+
+    def handle(self, *args, **options):
+        username = f"bench-login-{time.time_ns()}"
+        User.objects.create_user(username=username, password="bench-password", role="farmer")
+        try:
+            for workers in options["workers"] or [0, 4]:
+                hashing._executor = None
+                # The test client sends Host: testserver.
+                with override_settings(PASSWORD_HASH_WORKERS=workers,
+                                       ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                    asyncio.run(self.storm(username, options["concurrency"], options["seconds"], workers))
+        finally:
+            User.objects.filter(username=username).delete()
+            hashing._executor = None
+
+    async def storm(self, username, concurrency, seconds, workers):
+        client = AsyncClient()
+        baseline = await self.probe(client, 1.0)
+
+        logins, stop = [], asyncio.Event()
+
+        async def login_loop():
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = await client.post("/api/public/login/", {"username": username, "password": "bench-password"},
+                                             content_type="application/json")
+                assert response.status_code == 200 and "access_token" in response.json(), response.content
+                logins.append(time.perf_counter() - started)
+
+        loops = [asyncio.create_task(login_loop()) for _ in range(concurrency)]
+        started = time.perf_counter()
+        during = await self.probe(client, seconds)
+        stop.set()
+        await asyncio.gather(*loops)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"workers={workers}: {len(logins) / elapsed:.1f} logins/s "
+            f"(login p50 {statistics.median(logins) * 1000:.0f} ms, p99 {p99(logins) * 1000:.0f} ms); "
+            f"{PROBE_URL} p50/p99 idle {statistics.median(baseline) * 1000:.1f}/{p99(baseline) * 1000:.1f} ms, "
+            f"during storm {statistics.median(during) * 1000:.1f}/{p99(during) * 1000:.1f} ms"
+        )
+
+    async def probe(self, client, seconds):
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(PROBE_URL)
+            assert response.status_code == 200, response.content
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+        return latencies
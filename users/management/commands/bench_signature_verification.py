@@ -0,0 +1,132 @@
+import json
+import math
+import secrets
+import statistics
+import time
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, override_settings
+
+from stebofarm_project.middleware.signature_verification import SignatureVerificationMiddleware
+from users import nonces
+from users.frontend_keys import frontend_keys, signing_message
+from users.models import FrontendApp
+
+
+class Rollback(Exception):
+    pass
+
+
+def p99(values):
+    values = sorted(values)
+    return values[math.ceil(len(values) * 0.99) - 1] if values else 0.0
+
+
+def sign(private_key, payload):
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return private_key.sign(payload)
+    return private_key.sign(payload, padding.PKCS1v15(), hashes.SHA256())
+
+
+class LegacyMiddleware:
+    # The original per-request path: an exists() query, then RSA verification.
+    def __init__(self, get_response, public_key):
+        self.get_response = get_response
+        self.public_key = public_key
+
+    def __call__(self, request):
+        unique_key = request.headers.get("X-Unique-Key")
+        if not unique_key or not FrontendApp.objects.filter(unique_key=unique_key).exists():
+            return JsonResponse({"error": "Invalid or missing unique key"}, status=403)
+        try:
+            self.public_key.verify(bytes.fromhex(request.headers["X-Signature"]), request.body,
+                                   padding.PKCS1v15(), hashes.SHA256())
+        except Exception as e:
+            return JsonResponse({"error": "Invalid signature", "details": str(e)}, status=403)
+        return self.get_response(request)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure SignatureVerificationMiddleware overhead per request for each signature algorithm, against the "
+        "original query-plus-RSA path, with nonces kept in memory or in a cache alias. Frontends are created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000, help="Requests per run, each with its own nonce.")
+        parser.add_argument("--payload-bytes", type=int, default=512)
+        parser.add_argument("--nonce-cache", default="default",
+                            help="Cache alias for the shared nonce store run; empty to skip it.")
+
+    def handle(self, *args, **options):
+        payload = json.dumps({"data": "x" * max(options["payload_bytes"] - 12, 0)}).encode()
+        keys = {
+            "ed25519": ed25519.Ed25519PrivateKey.generate(),
+            "rsa-2048": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        }
+        try:
+            with transaction.atomic():
+                apps = {
+                    name: FrontendApp.objects.create(
+                        name=f"bench-{name}-{time.time_ns()}",
+                        unique_key=secrets.token_hex(32),
+                        public_key=key.public_key().public_bytes(
+                            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+                        ).decode(),
+                    )
+                    for name, key in keys.items()
+                }
+                frontend_keys.invalidate()
+                middleware = SignatureVerificationMiddleware(lambda request: HttpResponse())
+                legacy = LegacyMiddleware(lambda request: HttpResponse(), keys["rsa-2048"].public_key())
+
+                stores = [("memory nonces", None)]
+                if options["nonce_cache"]:
+                    stores.append((f"{options['nonce_cache']!r} cache nonces", options["nonce_cache"]))
+                for store, alias in stores:
+                    nonces._store = None
+                    with override_settings(SIGNATURE_NONCE_CACHE=alias):
+                        for name, key in keys.items():
+                            self.measure(f"{name}, {store}", middleware, apps[name].unique_key, key, payload,
+                                         options["requests"])
+                self.measure("legacy rsa-2048 + query", legacy, apps["rsa-2048"].unique_key, keys["rsa-2048"],
+                             payload, options["requests"], legacy=True)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            frontend_keys.invalidate()
+            nonces._store = None
+
+    def measure(self, label, handler, unique_key, private_key, payload, count, legacy=False):
+        # Signed up front so only the middleware is timed; the original
+        # scheme signs the body alone and can replay one request.
+        factory = RequestFactory()
+        requests = []
+        for _ in range(1 if legacy else count + 1):
+            timestamp, nonce = str(int(time.time())), secrets.token_hex(16)
+            message = payload if legacy else signing_message(timestamp, nonce, "POST", "/api/orders/create/", payload)
+            requests.append(factory.post(
+                "/api/orders/create/", payload, content_type="application/json",
+                headers={"X-Unique-Key": unique_key, "X-Signature": sign(private_key, message).hex(),
+                         "X-Timestamp": timestamp, "X-Nonce": nonce},
+            ))
+        response = handler(requests[0])  # warm up: loads the registry and parses the key
+        assert response.status_code == 200, response.content
+
+        timings = []
+        for index in range(count):
+            request = requests[0 if legacy else index + 1]
+            started = time.perf_counter()
+            response = handler(request)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.content
+        self.stdout.write(
+            f"{label}: mean {statistics.fmean(timings) * 1e6:.1f} us, p50 {statistics.median(timings) * 1e6:.1f} us, "
+            f"p99 {p99(timings) * 1e6:.1f} us per request ({len(payload)} byte body)"
+        )
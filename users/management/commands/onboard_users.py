@@ -0,0 +1,34 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stebofarm_project.imports import READERS
+from users.registration import ONBOARD_BATCH_SIZE, onboard_users
+
+
+class Command(BaseCommand):
+    help = "Register users, with their profiles, from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=sorted(READERS), help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=ONBOARD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        format = options["format"] or path.suffix.lstrip(".").lower()
+        if format not in READERS:
+            raise CommandError("Unsupported format, use --format csv or --format jsonl")
+
+        started = time.perf_counter()
+        with path.open("rb") as stream:
+            report = onboard_users(READERS[format](stream), batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(
+            f"Read {report.rows} rows, created {report.created} users, {report.error_count} errors "
+            f"in {elapsed:.2f}s ({report.rows / elapsed if elapsed else 0:,.0f} rows/s)"
+        )
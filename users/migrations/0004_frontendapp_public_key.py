@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_unique_user_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='frontendapp',
+            name='public_key',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -36,6 +36,12 @@ class User(AbstractUser):
         verbose_name='user permissions',
     )
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Registration checks this up front; the constraint settles races.
+            models.UniqueConstraint(fields=["email"], condition=~models.Q(email=""), name="unique_user_email"),
+        ]
+
 
 
 
@@ -50,4 +56,7 @@ class UserProfile(models.Model):
 class FrontendApp(models.Model):
     name = models.CharField(max_length=255, unique=True)
     unique_key = models.CharField(max_length=255, unique=True)  # Unique key for the frontend
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+    # PEM public key (Ed25519 or RSA) that verifies this frontend's request
+    # signatures; blank falls back to SIGNATURE_FALLBACK_PUBLIC_KEY.
+    public_key = models.TextField(blank=True, default="")
@@ -0,0 +1,75 @@
+import math
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+NONCE_BUCKET_SECONDS = 30
+
+
+class MemoryNonceStore:
+    """
+    Nonces seen in the last ``window`` seconds, kept in a ring of sets with
+    one set per ``bucket_seconds`` of request timestamps. A nonce is filed
+    under its (signed) timestamp, so a replay always lands in the same set
+    and ``add`` touches a single bucket. A bucket is emptied when the ring
+    comes round to it again, so memory follows the traffic of one window,
+    never the total.
+
+    Nonces are per process; use CacheNonceStore when several processes
+    serve requests.
+    """
+
+    def __init__(self, window, bucket_seconds=NONCE_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self._lock = threading.Lock()
+        # One spare bucket so the oldest timestamps still in the window keep their set.
+        size = math.ceil(window / bucket_seconds) + 1
+        self._epochs = [None] * size
+        self._buckets = [set() for _ in range(size)]
+
+    def add(self, key, timestamp):
+        """Record ``key``; False if it was already recorded for this timestamp's bucket."""
+        epoch = int(timestamp) // self.bucket_seconds
+        slot = epoch % len(self._buckets)
+        with self._lock:
+            bucket = self._buckets[slot]
+            if self._epochs[slot] != epoch:
+                bucket.clear()
+                self._epochs[slot] = epoch
+            if key in bucket:
+                return False
+            bucket.add(key)
+            return True
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(bucket) for bucket in self._buckets)
+
+
+class CacheNonceStore:
+    """Nonces in a Django cache shared by every process, e.g. Redis or Memcached."""
+
+    def __init__(self, alias, window):
+        self.cache = caches[alias]
+        self.timeout = window
+
+    def add(self, key, timestamp):
+        # cache.add is atomic and only writes when the key is absent.
+        return self.cache.add(f"nonce:{int(timestamp)}:{key}", 1, self.timeout)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_nonce_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            # Timestamps are accepted up to SIGNATURE_MAX_AGE either side of now.
+            window = 2 * getattr(settings, "SIGNATURE_MAX_AGE", 300)
+            alias = getattr(settings, "SIGNATURE_NONCE_CACHE", None)
+            _store = CacheNonceStore(alias, window) if alias else MemoryNonceStore(window)
+        return _store
@@ -0,0 +1,147 @@
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from pydantic import ValidationError
+
+from stebofarm_project.imports import ImportReport
+from .hashing import get_executor
+from .models import User, UserProfile
+from .schemas import UserRegistrationSchema
+
+
+ONBOARD_BATCH_SIZE = 200
+
+# Unique user fields in the order registration reports them.
+UNIQUE_FIELDS = {
+    "username": "Username already exists",
+    "email": "Email already exists",
+    "national_id": "National ID is already registered",
+    "driving_license": "Driving License is already registered",
+}
+
+ROLES = {role for role, _ in User.ROLE_CHOICES}
+
+
+def taken_values(**values):
+    """
+    Which of the given unique field values are already used, in one query.
+    ``values`` maps a field in UNIQUE_FIELDS to a collection of candidates;
+    returns ``{field: set of taken values}``.
+    """
+    condition = Q()
+    for name, candidates in values.items():
+        candidates = [value for value in candidates if value]
+        if candidates:
+            condition |= Q(**{f"{name}__in": candidates})
+    taken = {name: set() for name in values}
+    if not condition:
+        return taken
+    for row in User.objects.filter(condition).values(*values):
+        for name in values:
+            if row[name] and row[name] in values[name]:
+                taken[name].add(row[name])
+    return taken
+
+
+def unique_values(data):
+    """The UNIQUE_FIELDS values of ``data`` as they are stored, i.e. normalized."""
+    return {
+        "username": User.normalize_username(data.username),
+        "email": User.objects.normalize_email(data.email),
+        "national_id": data.national_id,
+        "driving_license": data.driving_license,
+    }
+
+
+def registration_conflict(data):
+    """The error for the first unique field of ``data`` that is taken, or None."""
+    values = {name: [value] for name, value in unique_values(data).items() if value}
+    taken = taken_values(**values)
+    for name, message in UNIQUE_FIELDS.items():
+        if taken.get(name):
+            return message
+    return None
+
+
+def _hash_passwords(passwords):
+    executor = get_executor()
+    if executor is None:
+        return [make_password(password) for password in passwords]
+    return list(executor.map(make_password, passwords))
+
+
+def onboard_users(rows, batch_size=ONBOARD_BATCH_SIZE):
+    """
+    Register many users at once, e.g. the members of a cooperative. Each row
+    is validated like a registration; a batch of valid rows is checked for
+    taken usernames, emails and IDs in one query, its passwords are hashed
+    in parallel in the password hashing pool, and its users and their
+    profiles are inserted with ``bulk_create``. Returns an ImportReport with
+    per-row errors, numbered from 1.
+    """
+    report = ImportReport()
+    batch = []
+    for number, row in enumerate(rows, start=1):
+        report.rows += 1
+        if isinstance(row, Exception):
+            report.add_error(number, f"Invalid row: {row}")
+            continue
+        try:
+            data = UserRegistrationSchema.model_validate(row)
+        except ValidationError as e:
+            report.add_error(number, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        if data.role not in ROLES:
+            report.add_error(number, f"Unknown role '{data.role}'")
+            continue
+        if not data.national_id and not data.driving_license:
+            report.add_error(number, "Either National ID or Driving License must be provided")
+            continue
+        batch.append((number, data))
+        if len(batch) >= batch_size:
+            _insert(batch, report)
+            batch = []
+    if batch:
+        _insert(batch, report)
+    return report
+
+
+def _insert(batch, report):
+    batch = [(number, data, unique_values(data)) for number, data in batch]
+    # Values taken by earlier rows of the same batch count as taken too.
+    taken = taken_values(**{name: {values[name] for _, _, values in batch} for name in UNIQUE_FIELDS})
+    accepted = []
+    for number, data, values in batch:
+        message = next((message for name, message in UNIQUE_FIELDS.items() if values[name] in taken[name]), None)
+        if message:
+            report.add_error(number, message)
+            continue
+        for name, value in values.items():
+            if value:
+                taken[name].add(value)
+        accepted.append((number, data, values))
+    if not accepted:
+        return
+
+    passwords = _hash_passwords([data.password for _, data, _ in accepted])
+    users = [
+        User(**values, password=password, role=data.role, is_verified=False)
+        for (_, data, values), password in zip(accepted, passwords)
+    ]
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            profiles = UserProfile.objects.bulk_create([
+                UserProfile(user=user, location=data.location, contact_number=data.contact_number)
+                for user, (_, data, _) in zip(users, accepted)
+            ])
+            for user, profile in zip(users, profiles):
+                user.profile = profile
+            User.objects.bulk_update(users, ["profile"])
+    except IntegrityError:
+        # Someone registered one of these values since the check; let the
+        # caller retry the batch rather than guessing which row lost.
+        for number, _, _ in accepted:
+            report.add_error(number, "Batch rejected: a username, email or ID was registered concurrently")
+        return
+    report.created += len(users)
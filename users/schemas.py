@@ -30,6 +30,7 @@ class UserProfileUpdateSchema(BaseModel):
 # Define a schema for the frontend app registration
 class FrontendAppSchema(BaseModel):
     name: str
+    public_key: Optional[str] = Field(None, description="PEM public key (Ed25519 or RSA) that verifies request signatures")
 
 
 
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import user_cache
+from .frontend_keys import frontend_keys
+from .models import FrontendApp, User, UserProfile
+
+
+# Drop cached authenticated users when they or their profile change.
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_user(sender, instance, **kwargs):
+    user_ids = set(User.objects.filter(profile=instance).values_list("id", flat=True))
+    user_ids.add(instance.user_id)
+    user_cache.invalidate(*user_ids)
+
+
+@receiver([post_save, post_delete], sender=FrontendApp)
+def reload_frontend_keys(sender, instance, **kwargs):
+    # After commit, so a reload cannot pick up the old row again.
+    transaction.on_commit(frontend_keys.invalidate)
@@ -1,3 +1,381 @@
-from django.test import TestCase
+import json
+import secrets
+import time
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from ninja_jwt.tokens import RefreshToken
+
+from orders.placement import cancel_pending_order, place_order
+from products.cache import get_cache
+from products.importer import import_products
+from products.models import Category, Offer, Product
+from stebofarm_project.middleware.signature_verification import SignatureVerificationMiddleware
+from .auth import UserCache, user_cache
+from . import nonces
+from .frontend_keys import frontend_keys, signing_message
+from .models import FrontendApp, User, UserProfile
+from .registration import onboard_users
+
+
+class CachedJWTAuthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="farmer", password="secret", role="farmer")
+        cls.profile = UserProfile.objects.create(user=cls.user, location="Nakuru", contact_number="0700000000")
+        cls.user.profile = cls.profile
+        cls.user.save()
+
+    def setUp(self):
+        user_cache.clear()
+        self.headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    def get_profile(self):
+        response = self.client.get("/api/users/profile/", headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_profile_is_loaded_with_the_user_then_cached(self):
+        # Before caching this took two queries: the user, then user.profile.
+        with self.assertNumQueries(1):
+            self.get_profile()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_profile()["location"], "Nakuru")
+
+    def test_changes_to_the_user_or_profile_invalidate_the_entry(self):
+        self.assertFalse(self.get_profile()["is_verified"])
+        user = User.objects.get(id=self.user.id)
+        user.is_verified = True
+        user.save()
+        self.assertTrue(self.get_profile()["is_verified"])
+
+        self.profile.location = "Eldoret"
+        self.profile.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_profile()["location"], "Eldoret")
+
+    def test_handlers_get_their_own_copy(self):
+        self.get_profile()
+        self.client.put("/api/users/profile/", {"location": "Kisumu"}, content_type="application/json",
+                        headers=self.headers)
+        self.assertEqual(self.get_profile()["location"], "Kisumu")
+        self.assertEqual(UserProfile.objects.get(id=self.profile.id).location, "Kisumu")
+
+    def test_cache_only_tracks_users_with_cached_tokens(self):
+        cache = UserCache(max_size=2)
+        for user_id in range(1, 5):
+            cache.set(user_id, "jti", self.user, cache.generation())
+        cache.invalidate(*range(100, 200))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(set(cache._tokens), {3, 4})
+
+        cache.invalidate(4)
+        self.assertIsNone(cache.get(4, "jti"))
+        self.assertEqual(set(cache._tokens), {3})
+
+    def test_a_load_raced_by_an_invalidation_is_not_cached(self):
+        cache = UserCache()
+        generation = cache.generation()
+        cache.invalidate(self.user.id)
+        cache.set(self.user.id, "jti", self.user, generation)
+        self.assertIsNone(cache.get(self.user.id, "jti"))
+
+
+class AsyncLoginTests(TestCase):
+    def login(self, username, password):
+        response = self.client.post("/api/public/login/", {"username": username, "password": password},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_register_then_login(self):
+        response = self.client.post(
+            "/api/public/register/",
+            {"username": "farmer", "email": "farmer@Example.COM", "password": "secret-pass", "role": "farmer",
+             "national_id": "123"},
+            content_type="application/json",
+        )
+        user = User.objects.get(id=response.json()["id"])
+        self.assertEqual(user.email, "farmer@example.com")
+        self.assertTrue(user.check_password("secret-pass"))
+
+        self.assertIn("access_token", self.login("farmer", "secret-pass"))
+        self.assertEqual(self.login("farmer", "wrong")["error"], "Invalid username or password")
+        self.assertEqual(self.login("nobody", "secret-pass")["error"], "Invalid username or password")
+
+    def test_login_rehashes_passwords_made_with_an_older_hasher(self):
+        user = User.objects.create(username="farmer", role="farmer",
+                                   password=make_password("secret-pass", hasher="pbkdf2_sha1"))
+        self.assertIn("access_token", self.login("farmer", "secret-pass"))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+        self.assertTrue(user.check_password("secret-pass"))
+
+    def test_failed_logins_send_user_login_failed(self):
+        User.objects.create_user(username="farmer", password="secret-pass", role="farmer", is_active=False)
+        failures = []
+        user_login_failed.connect(lambda sender, credentials, **kwargs: failures.append(credentials), weak=False,
+                                  dispatch_uid="login-failures")
+        self.addCleanup(user_login_failed.disconnect, dispatch_uid="login-failures")
+        for username, password in (("farmer", "secret-pass"), ("farmer", "wrong"), ("nobody", "secret-pass")):
+            self.assertEqual(self.login(username, password)["error"], "Invalid username or password")
+        self.assertEqual([credentials["username"] for credentials in failures], ["farmer", "farmer", "nobody"])
+        self.assertNotIn("secret-pass", str(failures))
+
+    @override_settings(AUTHENTICATION_BACKENDS=["users.tests.FixedUserBackend"])
+    def test_other_backends_are_used_through_django(self):
+        User.objects.create_user(username="farmer", password="unused", role="farmer")
+        self.assertEqual(self.login("farmer", "letmein")["user"]["username"], "farmer")
+        self.assertEqual(self.login("farmer", "unused")["error"], "Invalid username or password")
+
+
+class FixedUserBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        return User.objects.filter(username=username).first() if password == "letmein" else None
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class BenchLoginStormTests(TransactionTestCase):
+    # The test runner allows "testserver"; the project's settings do not.
+    @override_settings(ALLOWED_HOSTS=["127.0.0.1"])
+    def test_command_runs_against_the_configured_hosts(self):
+        out = StringIO()
+        call_command("bench_login_storm", seconds=0.2, concurrency=2, workers=[0, 1], stdout=out)
+        self.assertEqual([line.split(":")[0] for line in out.getvalue().splitlines()], ["workers=0", "workers=1"])
+        self.assertFalse(User.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class RegistrationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username="taken", email="taken@example.com", password="x", role="farmer",
+                                 national_id="111")
+
+    def register(self, **fields):
+        data = {"username": "new", "email": "new@example.com", "password": "secret-pass", "role": "farmer",
+                "national_id": "222", **fields}
+        return self.client.post("/api/public/register/", data, content_type="application/json").json()
+
+    def test_uniqueness_is_checked_in_one_query(self):
+        with self.assertNumQueries(2):  # the conflict check, then the insert
+            self.assertIn("id", self.register())
+        self.assertEqual(self.register(username="taken")["error"], "Username already exists")
+        self.assertEqual(self.register(username="other", email="taken@example.com")["error"], "Email already exists")
+        self.assertEqual(self.register(username="other", email="o@example.com", national_id="111")["error"],
+                         "National ID is already registered")
+
+    def test_conflicts_are_checked_against_normalized_values(self):
+        self.assertEqual(self.register(email="taken@EXAMPLE.com")["error"], "Email already exists")
+        self.assertIn("id", self.register(username="tak\u0065\u0301n"))  # stored NFKC-normalized as "tak\u00e9n"
+        self.assertEqual(self.register(username="tak\u00e9n", email="e@example.com", national_id="333")["error"],
+                         "Username already exists")
+        report = onboard_users([{"username": "amina", "email": "taken@Example.com", "password": "pw",
+                                 "role": "farmer", "national_id": "401"}])
+        self.assertEqual(report.errors, [{"row": 1, "error": "Email already exists"}])
+
+    def test_onboarding_reports_per_row_errors_and_creates_profiles(self):
+        rows = [
+            {"username": "amina", "email": "amina@example.com", "password": "pw", "role": "farmer",
+             "national_id": "301", "location": "Arusha"},
+            {"username": "taken", "email": "t2@example.com", "password": "pw", "role": "farmer", "national_id": "302"},
+            {"username": "baraka", "email": "amina@example.com", "password": "pw", "role": "farmer",
+             "national_id": "303"},
+            {"username": "chausiku", "email": "c@example.com", "password": "pw", "role": "banker", "national_id": "304"},
+            {"username": "daudi", "email": "d@example.com", "password": "pw", "role": "supplier",
+             "driving_license": "DL1", "contact_number": "0711"},
+        ]
+        with self.assertNumQueries(6):  # conflict check, then one transaction inserting users and profiles
+            report = onboard_users(rows)
+        self.assertEqual(report.created, 2)
+        self.assertEqual(
+            report.errors,
+            [
+                {"row": 4, "error": "Unknown role 'banker'"},
+                {"row": 2, "error": "Username already exists"},
+                {"row": 3, "error": "Email already exists"},
+            ],
+        )
+        amina = User.objects.select_related("profile").get(username="amina")
+        self.assertEqual(amina.profile.location, "Arusha")
+        self.assertTrue(amina.check_password("pw"))
+        self.assertEqual(User.objects.get(username="daudi").profile.contact_number, "0711")
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user(username="farmer", password="secret", role="farmer", is_verified=True)
+        cls.supplier = User.objects.create_user(username="supplier", password="secret", role="supplier",
+                                                is_verified=True)
+        category = Category.objects.create(name="Crop")
+        for name in ("Maize", "Beans"):
+            product = Product.objects.create(
+                name=name, description=name, category=category, price=10, stock=100, seller=cls.farmer,
+            )
+        cls.offer = Offer.objects.create(
+            product=product, offer_type="Sell", price_per_unit=5, quantity=10, min_order=1, max_order=10,
+            created_by=cls.farmer, expires_at=timezone.now() + timedelta(days=7),
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        user_cache.clear()
+        self.tokens = {user.id: RefreshToken.for_user(user).access_token for user in (self.farmer, self.supplier)}
+
+    def dashboard(self, user):
+        response = self.client.get("/api/users/dashboard/", headers={"Authorization": f"Bearer {self.tokens[user.id]}"})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_counts_are_read_in_one_query_then_cached(self):
+        self.dashboard(self.farmer)  # caches the authenticated user
+        get_cache().clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.dashboard(self.farmer), {
+                "role": "Farmer",
+                "products_count": 2,
+                "active_offers_count": 1,
+                "pending_orders_received_count": 0,
+                "pending_orders_placed_count": 0,
+            })
+        with self.assertNumQueries(0):
+            self.dashboard(self.farmer)
+
+    def test_bulk_imports_invalidate_the_seller(self):
+        self.dashboard(self.farmer)
+        with self.captureOnCommitCallbacks(execute=True):
+            import_products([{"name": "Sorghum", "category": "Crop", "price": "8", "stock": 5}], self.farmer)
+        self.assertEqual(self.dashboard(self.farmer)["products_count"], 3)
+
+    def test_orders_and_offers_invalidate_both_sides(self):
+        self.dashboard(self.farmer)
+        self.dashboard(self.supplier)
+        with self.captureOnCommitCallbacks(execute=True):
+            first, _ = place_order(self.supplier, self.offer.id, 4)
+            place_order(self.supplier, self.offer.id, 6)
+
+        farmer = self.dashboard(self.farmer)
+        self.assertEqual((farmer["active_offers_count"], farmer["pending_orders_received_count"]), (0, 2))
+        self.assertEqual(self.dashboard(self.supplier)["pending_orders_placed_count"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_pending_order(first.id, self.supplier)
+        farmer = self.dashboard(self.farmer)
+        self.assertEqual((farmer["active_offers_count"], farmer["pending_orders_received_count"]), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Offer.objects.get(id=self.offer.id).delete()
+        self.assertEqual(self.dashboard(self.farmer)["active_offers_count"], 0)
+
+
+def public_pem(private_key):
+    return private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+
+
+class SignatureVerificationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Key objects cannot be deep-copied, so they stay out of setUpTestData.
+        cls.ed25519 = ed25519.Ed25519PrivateKey.generate()
+        cls.rsa = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.apps = {
+            name: FrontendApp.objects.create(name=name, unique_key=f"{name}-key", public_key=public_pem(key))
+            for name, key in (("ed25519", cls.ed25519), ("rsa", cls.rsa))
+        }
+
+    def setUp(self):
+        frontend_keys.invalidate()
+        nonces._store = None
+        self.middleware = SignatureVerificationMiddleware(lambda request: HttpResponse("ok"))
+
+    def signed(self, private_key, body=b'{"order": 1}', timestamp=None, nonce=None):
+        timestamp = str(timestamp or int(time.time()))
+        nonce = nonce or secrets.token_hex(16)
+        message = signing_message(timestamp, nonce, "POST", "/api/orders/create/", body)
+        if isinstance(private_key, ed25519.Ed25519PrivateKey):
+            signature = private_key.sign(message)
+        else:
+            signature = private_key.sign(message, padding.PKCS1v15(), hashes.SHA256())
+        return {"X-Signature": signature.hex(), "X-Timestamp": timestamp, "X-Nonce": nonce}
+
+    def call(self, unique_key, headers, body=b'{"order": 1}'):
+        request = RequestFactory().post("/api/orders/create/", body, content_type="application/json",
+                                        headers={"X-Unique-Key": unique_key, **headers})
+        return self.middleware(request)
+
+    def test_both_algorithms_verify_without_queries(self):
+        self.call("rsa-key", self.signed(self.rsa))  # loads the registry
+        with self.assertNumQueries(0):
+            self.assertEqual(self.call("ed25519-key", self.signed(self.ed25519)).status_code, 200)
+            self.assertEqual(self.call("rsa-key", self.signed(self.rsa)).status_code, 200)
+            self.assertEqual(self.call("ed25519-key", self.signed(self.rsa)).status_code, 403)
+            self.assertEqual(self.call("ed25519-key", {**self.signed(self.ed25519), "X-Signature": "zz"}).status_code,
+                             403)
+            self.assertEqual(self.call("unknown-key", self.signed(self.ed25519)).status_code, 403)
+
+    def test_key_changes_reload_the_registry(self):
+        replacement = ed25519.Ed25519PrivateKey.generate()
+        self.assertEqual(self.call("ed25519-key", self.signed(replacement)).status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apps["ed25519"].public_key = public_pem(replacement)
+            self.apps["ed25519"].save()
+        self.assertEqual(self.call("ed25519-key", self.signed(replacement)).status_code, 200)
+
+    @override_settings(SIGNATURE_FALLBACK_PUBLIC_KEY="/nonexistent/public_key.pem")
+    def test_frontends_without_a_key_are_rejected_when_there_is_no_fallback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            FrontendApp.objects.create(name="keyless", unique_key="keyless-key")
+        response = self.call("keyless-key", self.signed(self.ed25519))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(json.loads(response.content)["details"], "No public key registered for this frontend")
+
+    def test_replays_and_tampering_are_rejected(self):
+        headers = self.signed(self.ed25519)
+        self.assertEqual(self.call("ed25519-key", headers).status_code, 200)
+        self.assertEqual(self.call("ed25519-key", headers).status_code, 403)
+        # The same nonce from another frontend is a different request.
+        self.assertEqual(self.call("rsa-key", self.signed(self.rsa, nonce=headers["X-Nonce"])).status_code, 200)
+
+        fresh = self.signed(self.ed25519)
+        for tampered in ({"X-Nonce": secrets.token_hex(16)}, {"X-Timestamp": str(int(time.time()) - 1)}):
+            self.assertEqual(self.call("ed25519-key", {**fresh, **tampered}).status_code, 403)
+        self.assertEqual(self.call("ed25519-key", fresh, b'{"order": 2}').status_code, 403)
+
+        stale = self.signed(self.ed25519, timestamp=int(time.time()) - 301)
+        self.assertEqual(self.call("ed25519-key", stale).status_code, 403)
+
+    @override_settings(SIGNATURE_NONCE_CACHE="default")
+    def test_nonces_can_be_shared_through_a_cache(self):
+        headers = self.signed(self.ed25519)
+        self.assertEqual(self.call("ed25519-key", headers).status_code, 200)
+        nonces._store = None  # as if another process handled the replay
+        self.assertEqual(self.call("ed25519-key", headers).status_code, 403)
+
+
+class MemoryNonceStoreTests(TestCase):
+    def test_buckets_are_reused_once_they_leave_the_window(self):
+        store = nonces.MemoryNonceStore(window=60, bucket_seconds=10)
+        self.assertTrue(store.add("a", 1000))
+        self.assertFalse(store.add("a", 1005))
+        for second in range(1001, 1070):
+            store.add(f"n{second}", second)
+        self.assertEqual(len(store), 70)  # seven buckets of ten seconds
+        # 1070 takes over the bucket of 1000-1009, which has left the window.
+        self.assertTrue(store.add("a", 1070))
+        self.assertEqual(len(store), 61)